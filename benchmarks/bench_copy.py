@@ -0,0 +1,62 @@
+"""
+Allocations per merge of two version ranges, with the structural
+:py:func:`conda_envfile.VersionRange.copy` that merging uses,
+compared to merging a :py:func:`copy.deepcopy` of the operand (as merging did before).
+The merge cache is disabled such that every merge is computed.
+"""
+
+import argparse
+import copy
+import time
+import tracemalloc
+
+import conda_envfile
+
+
+def measure(merge, n: int) -> tuple[float, float, float]:
+    """
+    Retained allocations of ``n`` merges.
+
+    :param merge: Function without arguments that returns a merged range.
+    :param n: Number of merges.
+    :return: (allocations per merge, bytes per merge, microseconds per merge).
+    """
+    keep = []
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    for _ in range(n):
+        keep.append(merge())
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    stats = after.compare_to(before, "filename")
+    count = sum(i.count_diff for i in stats)
+    size = sum(i.size_diff for i in stats)
+
+    tic = time.perf_counter()
+    for _ in range(n):
+        merge()
+    toc = time.perf_counter()
+
+    return count / n, size / n, (toc - tic) / n * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-n", type=int, default=10000, help="Number of merges.")
+    args = parser.parse_args()
+
+    a = conda_envfile.VersionRange(greater_equal="1.0")
+    b = conda_envfile.VersionRange(less="2.0")
+
+    with conda_envfile.merge_cache(maxsize=0):
+        cases = {
+            "deepcopy": lambda: copy.deepcopy(a) + b,
+            "copy": lambda: a + b,
+        }
+        for name, merge in cases.items():
+            count, size, duration = measure(merge, args.n)
+            print(f"{name:>8s}: {count:.1f} allocations, {size:.0f} bytes, {duration:.1f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+Time of checking many sets of requirements against one set of installed packages:
+:py:func:`conda_envfile.contains` with a list (that builds the lookup on every call),
+compared to one :py:class:`conda_envfile.InstalledIndex` (with and without full reports).
+"""
+
+import argparse
+import random
+import time
+
+import conda_envfile
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--installed", type=int, default=400, help="Installed packages.")
+    parser.add_argument("--sets", type=int, default=3000, help="Number of requirement sets.")
+    parser.add_argument("--size", type=int, default=40, help="Requirements per set.")
+    args = parser.parse_args()
+
+    random.seed(0)
+    installed = [
+        f"pkg{i}={random.randint(1, 3)}.{random.randint(0, 9)}=generic"
+        for i in range(args.installed)
+    ]
+    choices = [f"pkg{i}" for i in range(args.installed + 10)]
+    choices += [f"pkg{i} >=1.{k}" for i in range(args.installed) for k in range(0, 10, 3)]
+    choices += [f"pkg{i} <3.{k}" for i in range(args.installed) for k in range(0, 10, 3)]
+    sets = [random.sample(choices, args.size) for _ in range(args.sets)]
+
+    tic = time.perf_counter()
+    expect = [conda_envfile.contains(requirements, installed) for requirements in sets]
+    rebuild = time.perf_counter() - tic
+
+    tic = time.perf_counter()
+    index = conda_envfile.InstalledIndex(installed)
+    assert index.check_many(sets) == expect
+    once = time.perf_counter() - tic
+
+    tic = time.perf_counter()
+    index = conda_envfile.InstalledIndex(installed)
+    reports = index.check_many(sets, report=True)
+    report = time.perf_counter() - tic
+    assert [len(i) == 0 for i in reports] == expect
+
+    print(f"{sum(expect)} of {len(sets)} sets are met")
+    print(f"contains (lookup per call): {rebuild:.3f}s")
+    print(f"InstalledIndex: {once:.3f}s")
+    print(f"InstalledIndex (report): {report:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
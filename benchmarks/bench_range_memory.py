@@ -0,0 +1,49 @@
+"""
+Memory per :py:class:`conda_envfile.VersionRange` (including the cache of parsed version keys)
+and the time to construct and merge ranges, for ranges with distinct bounds
+(``>=1.i, <2.i``).
+"""
+
+import argparse
+import time
+import tracemalloc
+
+import conda_envfile
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-n", type=int, default=100000, help="Number of ranges.")
+    args = parser.parse_args()
+
+    VersionRange = conda_envfile.VersionRange
+    bounds = [(f"1.{i}", f"2.{i}") for i in range(args.n)]
+
+    conda_envfile._version_key.cache_clear()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    ranges = [VersionRange(greater_equal=lower, less=upper) for lower, upper in bounds]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    size = sum(i.size_diff for i in after.compare_to(before, "filename"))
+    print(f"memory: {size / args.n:.0f} bytes per range")
+
+    # distinct bounds are parsed, repeated bounds come from the cache of parsed keys
+    conda_envfile._version_key.cache_clear()
+    for label, data in [("distinct", bounds), ("repeated", [("1.2", "2.0")] * args.n)]:
+        tic = time.perf_counter()
+        [VersionRange(greater_equal=lower, less=upper) for lower, upper in data]
+        toc = time.perf_counter()
+        print(f"construct ({label} bounds): {(toc - tic) / args.n * 1e6:.1f} us per range")
+
+    other = VersionRange(greater_equal="1.0")
+    with conda_envfile.merge_cache(maxsize=0):
+        tic = time.perf_counter()
+        for rng in ranges:
+            rng + other
+        toc = time.perf_counter()
+    print(f"merge: {(toc - tic) / args.n * 1e6:.1f} us per merge")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Time of removing the lines with a ``# [selector]`` that does not apply from a large
+multi-output recipe (generated by repeating the outputs of ``tests/condaforge_multioutput.yaml``),
+compared to the previous approach of scanning all lines once per known selector with a regex.
+"""
+
+import argparse
+import itertools
+import pathlib
+import re
+import time
+
+import conda_envfile
+
+recipe = pathlib.Path(__file__).parents[1] / "tests" / "condaforge_multioutput.yaml"
+
+
+# selectors that the previous approach removed unless selected
+regex_selectors = conda_envfile._selector_names + [
+    "build_platform",
+    "build_platform != target_platform",
+]
+
+
+def regex_filter(lines: list[str], selectors: list[str]) -> list[str]:
+    """
+    Previous approach: one pass over all lines per selector that is not selected.
+    """
+    for selector in regex_selectors:
+        if selector not in selectors:
+            lines = [i for i in lines if not re.match(rf"(.*)(# \[{selector}\])(.*)", i)]
+    return lines
+
+
+def engine_filter(lines: list[str], selectors: list[str]) -> list[str]:
+    """
+    Selector engine: one pass over all lines, each distinct selector evaluated once.
+    """
+    context = conda_envfile._selector_context(selectors)
+    mask = conda_envfile._selector_mask(conda_envfile._locate_selectors(lines), selectors, context)
+    return list(itertools.compress(lines, mask))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--outputs", type=int, default=300, help="Number of outputs.")
+    args = parser.parse_args()
+
+    text = conda_envfile._condaforge_template(recipe.read_text()).render(target_platform="linux-64")
+    head, outputs = text.split("\noutputs:\n")
+    lines = (head + "\noutputs:\n" + outputs * (args.outputs // 2)).split("\n")
+    print(f"{len(lines)} lines")
+
+    for selectors in [[], ["unix"], ["win"]]:
+        tic = time.perf_counter()
+        old = regex_filter(lines, selectors)
+        regex = time.perf_counter() - tic
+
+        tic = time.perf_counter()
+        new = engine_filter(lines, selectors)
+        engine = time.perf_counter() - tic
+
+        assert old == new
+        print(f"selectors {selectors}: regex {regex * 1e3:.0f} ms, engine {engine * 1e3:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Time of :py:func:`conda_envfile.unique_many` compared to :py:func:`conda_envfile.unique`
+for growing lists of dependencies (drawn from a fixed set of compatible specifiers).
+"""
+
+import argparse
+import random
+import time
+
+import conda_envfile
+
+
+def specifiers(packages: int) -> list[str]:
+    """
+    Seven compatible specifiers per package.
+
+    :param packages: Number of packages.
+    :return: List of specifiers.
+    """
+    ret = []
+    for i in range(packages):
+        ret.append(f"pkg{i}")
+        ret += [f"pkg{i} >=1.{k}" for k in range(3)]
+        ret += [f"pkg{i} <3.{k}" for k in range(3)]
+    return ret
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--packages", type=int, default=500, help="Number of packages.")
+    parser.add_argument("--max-unique", type=int, default=10**5, help="Largest size for unique.")
+    parser.add_argument("sizes", type=int, nargs="*", default=[10**4, 10**5, 10**6])
+    args = parser.parse_args()
+
+    random.seed(0)
+    specs = specifiers(args.packages)
+
+    for n in args.sizes:
+        deps = random.choices(specs, k=n)
+
+        tic = time.perf_counter()
+        ret = conda_envfile.unique_many(deps)
+        toc = time.perf_counter()
+        line = f"{n:>8d} entries: unique_many {toc - tic:.2f}s"
+
+        if n <= args.max_unique:
+            tic = time.perf_counter()
+            assert conda_envfile.unique(*deps) == ret
+            toc = time.perf_counter()
+            line += f", unique {toc - tic:.2f}s"
+
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Time of reading environment files and conda-forge recipes with each YAML backend
+(see :py:func:`conda_envfile.set_yaml_backend`).
+The on-disk cache is disabled.
+"""
+
+import argparse
+import pathlib
+import tempfile
+import time
+
+import yaml
+
+import conda_envfile
+
+recipe = pathlib.Path(__file__).parents[1] / "tests" / "condaforge_multioutput.yaml"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--files", type=int, default=50, help="Number of environment files.")
+    parser.add_argument("--deps", type=int, default=2000, help="Dependencies per file.")
+    parser.add_argument("--renders", type=int, default=200, help="Number of recipe renders.")
+    args = parser.parse_args()
+
+    conda_envfile.disable_disk_cache()
+    backends = ["python", "c"] if yaml.__with_libyaml__ else ["python"]
+    text = recipe.read_text()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        files = []
+        for i in range(args.files):
+            deps = [f"  - pkg{j} >=1.{i}\n" for j in range(args.deps)]
+            files.append(pathlib.Path(tmp) / f"env{i}.yaml")
+            files[-1].write_text("channels:\n  - conda-forge\ndependencies:\n" + "".join(deps))
+
+        # warm-up: both backends find the dependencies in the cache of parsed specifiers
+        for filename in files:
+            conda_envfile.parse_file(filename)
+        conda_envfile.condaforge_dependencies(text)
+
+        for backend in backends:
+            conda_envfile.set_yaml_backend(backend)
+
+            tic = time.perf_counter()
+            for filename in files:
+                conda_envfile.parse_file(filename)
+            parse = time.perf_counter() - tic
+
+            tic = time.perf_counter()
+            for _ in range(args.renders):
+                conda_envfile.condaforge_dependencies(text)
+            render = time.perf_counter() - tic
+
+            print(f"{backend:>6s}: parse_file {parse:.2f}s, condaforge_dependencies {render:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
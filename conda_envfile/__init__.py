@@ -1,37 +1,349 @@
 import argparse
-import copy
+import bisect
+import contextlib
+import functools
+import itertools
+import marshal
 import os
 import pathlib
 import re
 import sys
 import textwrap
-import tomllib
 import warnings
+from collections import Counter
+from collections import OrderedDict
 from collections import defaultdict
+from collections import namedtuple
+from typing import TYPE_CHECKING
 
-import click
-import packaging.specifiers
 import packaging.version
-import prettytable
-import yaml
-from jinja2 import BaseLoader
-from jinja2 import Environment
 from packaging.version import Version
 from packaging.version import _cmpkey
 
 from ._version import version
 
-_MinInf = Version("0")
-_MinInf._key = _cmpkey(
+if TYPE_CHECKING:
+    import prettytable
+
+# comparison keys (see ``packaging.version.Version._key``) of an unbounded range
+_MinInf = _cmpkey(
     epoch=-sys.maxsize, release=(-sys.maxsize,), pre=None, post=None, dev=None, local=None
 )
 
-_PlusInf = Version("999999999999")
-_PlusInf._key = _cmpkey(
+_PlusInf = _cmpkey(
     epoch=+sys.maxsize, release=(+sys.maxsize,), pre=None, post=None, dev=None, local=None
 )
 
 
+@functools.lru_cache(maxsize=16384)
+def _version_key(value: str) -> tuple:
+    """
+    Comparison key of a version string.
+    Keys are plain tuples: comparing them avoids the overhead of ``Version.__lt__``, etc.
+
+    :param value: Version, e.g. ``"1.0"``.
+    :return: Comparison key.
+    """
+    return packaging.version.parse(value)._key
+
+
+def _as_key(parsed) -> tuple:
+    """
+    Comparison key of a parsed version, or the key itself.
+    """
+    if isinstance(parsed, Version):
+        return parsed._key
+    return parsed
+
+
+_yaml_backend = None
+
+
+def set_yaml_backend(backend: str = None):
+    """
+    Select the YAML implementation used to read and write files:
+
+    *   ``"c"``: the (fast) libyaml based ``CSafeLoader`` / ``CSafeDumper``
+        (raises if PyYAML was built without libyaml).
+    *   ``"python"``: the pure-Python ``SafeLoader`` / ``SafeDumper``.
+    *   ``"auto"``: libyaml if available, pure-Python otherwise.
+
+    :param backend:
+        Backend.
+        Default: the environment variable ``CONDA_ENVFILE_YAML_BACKEND`` or ``"auto"``.
+    """
+    global _yaml_backend
+
+    import yaml
+
+    if backend is None:
+        backend = os.environ.get("CONDA_ENVFILE_YAML_BACKEND", "auto")
+
+    backend = backend.lower()
+
+    if backend == "auto":
+        backend = "c" if yaml.__with_libyaml__ else "python"
+    elif backend == "c":
+        if not yaml.__with_libyaml__:
+            raise ValueError("PyYAML is not built with libyaml")
+    elif backend != "python":
+        raise ValueError(f"Unknown YAML backend '{backend}'")
+
+    _yaml_backend = backend
+
+
+def get_yaml_backend() -> str:
+    """
+    Return the YAML implementation in use, see :py:func:`set_yaml_backend`.
+
+    :return: ``"c"`` or ``"python"``.
+    """
+    if _yaml_backend is None:
+        set_yaml_backend()
+    return _yaml_backend
+
+
+def _yaml_loader():
+    import yaml
+
+    if get_yaml_backend() == "c":
+        return yaml.CSafeLoader
+    return yaml.SafeLoader
+
+
+def _yaml_dumper():
+    import yaml
+
+    if get_yaml_backend() == "c":
+        return yaml.CSafeDumper
+    return yaml.SafeDumper
+
+
+def _yaml_load(stream):
+    """
+    Load YAML (from text or file object) with the selected backend.
+    """
+    import yaml
+
+    return yaml.load(stream, Loader=_yaml_loader())
+
+
+def _yaml_dump(data, stream=None, **kwargs):
+    """
+    Dump YAML with the selected backend, see ``yaml.dump`` for options.
+    """
+    import yaml
+
+    return yaml.dump(data, stream, Dumper=_yaml_dumper(), **kwargs)
+
+
+class _DiskCache:
+    """
+    Size-bounded on-disk cache.
+    Entries are serialised with :py:mod:`marshal` and written atomically.
+    If the total size exceeds ``max_size``, the least recently used entries are removed.
+
+    :param path: Directory of the cache.
+    :param max_size: Maximal size of the cache in bytes.
+    """
+
+    def __init__(self, path: str, max_size: int = 64 * 1024 * 1024):
+        self.path = pathlib.Path(path)
+        self.max_size = max_size
+        self._size = None
+
+    def key(self, kind: str, content: bytes, *args) -> str:
+        """
+        Key of an entry.
+
+        :param kind: Kind of entry.
+        :param content: Content of the parsed file.
+        :param args: Other options that influence the result (converted to string).
+        :return: Key.
+        """
+        import hashlib
+
+        h = hashlib.sha256()
+        h.update(repr((kind, version, args)).encode())
+        h.update(content)
+        return h.hexdigest()
+
+    def get(self, key: str):
+        """
+        Return the stored value, or ``None`` if not present.
+        """
+        path = self.path / key
+        try:
+            with open(path, "rb") as file:
+                ret = marshal.load(file)
+            os.utime(path)
+        except (OSError, EOFError, ValueError, TypeError):
+            return None
+        return ret
+
+    def put(self, key: str, value):
+        """
+        Store a value (silently skipped if it cannot be serialised or written).
+        """
+        try:
+            data = marshal.dumps(value)
+        except ValueError:
+            return
+
+        import tempfile
+
+        try:
+            self.path.mkdir(parents=True, exist_ok=True)
+            with tempfile.NamedTemporaryFile(dir=self.path, prefix=".", delete=False) as file:
+                file.write(data)
+            os.replace(file.name, self.path / key)
+        except OSError:
+            return
+
+        if self._size is None:
+            self._size = sum(i.stat().st_size for i in os.scandir(self.path) if i.is_file())
+        else:
+            self._size += len(data)
+
+        if self._size > self.max_size:
+            self._evict()
+
+    def _evict(self):
+        entries = [i for i in os.scandir(self.path) if i.is_file()]
+        entries = sorted(entries, key=lambda i: i.stat().st_mtime)
+        self._size = sum(i.stat().st_size for i in entries)
+        for entry in entries:
+            if self._size <= 0.8 * self.max_size:
+                break
+            try:
+                os.remove(entry.path)
+                self._size -= entry.stat().st_size
+            except OSError:
+                pass
+
+
+_disk_cache = None
+
+
+def enable_disk_cache(path: str = None, max_size: int = 64 * 1024 * 1024):
+    """
+    Store the result of parsing files on disk, such that unchanged files are not parsed again.
+    Entries are identified by the content of the file, the version of this library,
+    and the options that influence the result.
+    Can also be enabled by setting the environment variable ``CONDA_ENVFILE_CACHE``
+    (to ``1`` to use the default location, or to a directory).
+
+    :param path: Directory of the cache. Default: ``$XDG_CACHE_HOME/conda_envfile``.
+    :param max_size: Maximal size of the cache in bytes.
+    """
+    global _disk_cache
+
+    if path is None:
+        base = os.environ.get("XDG_CACHE_HOME", os.path.join(os.path.expanduser("~"), ".cache"))
+        path = os.path.join(base, "conda_envfile")
+
+    _disk_cache = _DiskCache(path, max_size)
+
+
+def disable_disk_cache():
+    """
+    Do not use an on-disk cache, see :py:func:`enable_disk_cache`.
+    """
+    global _disk_cache
+    _disk_cache = False
+
+
+def _get_disk_cache() -> _DiskCache:
+    """
+    Return the on-disk cache, or ``None`` if disabled.
+    """
+    if _disk_cache is None:
+        env = os.environ.get("CONDA_ENVFILE_CACHE", "")
+        if env.lower() in ["", "0", "false", "no"]:
+            disable_disk_cache()
+        elif env.lower() in ["1", "true", "yes"]:
+            enable_disk_cache()
+        else:
+            enable_disk_cache(env)
+    return _disk_cache or None
+
+
+def _init_worker(yaml_backend: str, disk_cache: _DiskCache, jinja_options: dict = None):
+    """
+    Initialise a worker process with the settings of the parent.
+    """
+    global _disk_cache
+    set_yaml_backend(yaml_backend)
+    set_jinja_environment(**(jinja_options or {}))
+    _disk_cache = disk_cache if disk_cache else False
+
+
+def _add_cache_arguments(parser: argparse.ArgumentParser):
+    """
+    Add the options to control the on-disk cache to a command-line parser.
+    """
+    parser.add_argument(
+        "--cache-dir",
+        type=str,
+        help="Cache parsed files in this directory (or set the CONDA_ENVFILE_CACHE variable).",
+    )
+    parser.add_argument("--no-cache", action="store_true", help="Do not use the on-disk cache.")
+
+
+def _scoped_cache_arguments(func):
+    """
+    Decorator for command-line tools that use :py:func:`_apply_cache_arguments`:
+    restore the on-disk cache setting when the tool returns (or raises),
+    such that calling the tool as a function does not change it for the rest of the process.
+    """
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        global _disk_cache
+        previous = _disk_cache
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _disk_cache = previous
+
+    return wrapper
+
+
+def _apply_cache_arguments(args: argparse.Namespace):
+    """
+    Apply the options added by :py:func:`_add_cache_arguments`.
+    Only use in a function decorated with :py:func:`_scoped_cache_arguments`.
+    """
+    if args.no_cache:
+        disable_disk_cache()
+    elif args.cache_dir:
+        enable_disk_cache(args.cache_dir)
+
+
+def _map(func, args: list, workers: int = None) -> list:
+    """
+    Return ``list(map(func, args))``.
+    If ``workers > 1`` the calls are distributed over a pool of processes
+    (the order of the output is the same as the order of ``args``).
+
+    :param func: Function (picklable: defined at module level).
+    :param args: List of arguments.
+    :param workers: Number of processes.
+    :return: List of results.
+    """
+    if workers is None or workers <= 1 or len(args) <= 1:
+        return list(map(func, args))
+
+    import concurrent.futures
+
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=min(workers, len(args)),
+        initializer=_init_worker,
+        initargs=(get_yaml_backend(), _get_disk_cache(), _jinja_options),
+    ) as pool:
+        return list(pool.map(func, args))
+
+
 class _MyFmt(
     argparse.RawDescriptionHelpFormatter,
     argparse.ArgumentDefaultsHelpFormatter,
@@ -40,6 +352,88 @@ class _MyFmt(
     pass
 
 
+CacheInfo = namedtuple("CacheInfo", ["hits", "misses", "evictions", "maxsize", "currsize"])
+CacheInfo.__doc__ = """
+Statistics of a cache, see e.g. :py:func:`specifier_cache_info`.
+"""
+
+
+class _LRUCache:
+    """
+    Bounded least-recently-used cache with hit/miss/eviction counters.
+    A ``maxsize`` of zero disables the cache.
+    """
+
+    def __init__(self, maxsize: int):
+        self._data = OrderedDict()
+        self._maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        try:
+            value = self._data[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        if self._maxsize <= 0:
+            return
+        self._data[key] = value
+        self._data.move_to_end(key)
+        while len(self._data) > self._maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def resize(self, maxsize: int):
+        self._maxsize = maxsize
+        while len(self._data) > max(maxsize, 0):
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self._data.clear()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def info(self) -> CacheInfo:
+        return CacheInfo(self.hits, self.misses, self.evictions, self._maxsize, len(self._data))
+
+
+class _MemoCache:
+    """
+    Bounded memo of a pure function, with the same statistics as :py:class:`_LRUCache`.
+    The lookup is done by ``functools.lru_cache`` (faster than :py:class:`_LRUCache`):
+    call ``cache.call(*args)``.
+    """
+
+    def __init__(self, func, maxsize: int):
+        self._func = func
+        self._maxsize = maxsize
+        self.evictions = 0
+        self.call = functools.lru_cache(maxsize=maxsize)(self._miss)
+
+    def _miss(self, *args):
+        # the result is stored after this call: the least-recently-used entry is evicted if full
+        if self.call.cache_info().currsize >= self._maxsize:
+            self.evictions += 1
+        return self._func(*args)
+
+    def clear(self):
+        self.call.cache_clear()
+        self.evictions = 0
+
+    def info(self) -> CacheInfo:
+        info = self.call.cache_info()
+        return CacheInfo(info.hits, info.misses, self.evictions, info.maxsize, info.currsize)
+
+
 class VersionRange:
     """
     Specify the most restrictive version range.
@@ -65,8 +459,12 @@ class VersionRange:
             >>> b = VersionRange(greater="1.0")
             >>> print(a + b)
             ">1.0, <2.0"
+
+    Internally, bounds are stored both as string (e.g. ``lt``) and as comparison key (e.g. ``_lt``).
     """
 
+    __slots__ = ("eq", "lt", "le", "gt", "ge", "_eq", "_lt", "_le", "_gt", "_ge")
+
     def __init__(
         self,
         equal: str = None,
@@ -87,11 +485,14 @@ class VersionRange:
         self.gt = None
         self.ge = None
 
-        self.less = less
-        self.less_equal = less_equal
-        self.greater = greater
-        self.greater_equal = greater_equal
-
+        if less:
+            self.less = less
+        if less_equal:
+            self.less_equal = less_equal
+        if greater:
+            self.greater = greater
+        if greater_equal:
+            self.greater_equal = greater_equal
         if equal:
             self.equal = equal
 
@@ -122,7 +523,7 @@ class VersionRange:
             self._eq = _PlusInf
             return
 
-        self.set_equal(value, packaging.version.parse(value))
+        self.set_equal(value, _version_key(value))
 
     @less.setter
     def less(self, value: str):
@@ -131,7 +532,7 @@ class VersionRange:
             self._lt = _PlusInf
             return
 
-        self.set_less(value, packaging.version.parse(value))
+        self.set_less(value, _version_key(value))
 
     @less_equal.setter
     def less_equal(self, value: str):
@@ -140,7 +541,7 @@ class VersionRange:
             self._le = _PlusInf
             return
 
-        self.set_less_equal(value, packaging.version.parse(value))
+        self.set_less_equal(value, _version_key(value))
 
     @greater.setter
     def greater(self, value: str):
@@ -149,7 +550,7 @@ class VersionRange:
             self._gt = _MinInf
             return
 
-        self.set_greater(value, packaging.version.parse(value))
+        self.set_greater(value, _version_key(value))
 
     @greater_equal.setter
     def greater_equal(self, value: str):
@@ -158,9 +559,11 @@ class VersionRange:
             self._ge = _MinInf
             return
 
-        self.set_greater_equal(value, packaging.version.parse(value))
+        self.set_greater_equal(value, _version_key(value))
+
+    def set_equal(self, value: str, parsed, force: bool = True):
+        parsed = _as_key(parsed)
 
-    def set_equal(self, value: str, parsed: Version, force: bool = True):
         if self.eq:
             if parsed != self._eq:
                 raise ValueError("Can't set equal to two different values")
@@ -188,7 +591,9 @@ class VersionRange:
         self.greater = None
         self.greater_equal = None
 
-    def set_less(self, value: str, parsed: Version, force: bool = True):
+    def set_less(self, value: str, parsed, force: bool = True):
+        parsed = _as_key(parsed)
+
         if self.eq:
             if parsed > self._eq:
                 return
@@ -217,7 +622,9 @@ class VersionRange:
         if parsed <= self._ge:
             raise ValueError(f"Version clash: <={value}")
 
-    def set_less_equal(self, value: str, parsed: Version, force: bool = True):
+    def set_less_equal(self, value: str, parsed, force: bool = True):
+        parsed = _as_key(parsed)
+
         if self.eq:
             if parsed >= self._eq:
                 return
@@ -249,7 +656,9 @@ class VersionRange:
         if self._le == self._ge:
             self.set_equal(value, parsed)
 
-    def set_greater(self, value: str, parsed: Version, force: bool = True):
+    def set_greater(self, value: str, parsed, force: bool = True):
+        parsed = _as_key(parsed)
+
         if self.eq:
             if parsed < self._eq:
                 return
@@ -278,7 +687,9 @@ class VersionRange:
         if parsed >= self._le:
             raise ValueError(f"Version clash: >={value}")
 
-    def set_greater_equal(self, value: str, parsed: Version, force: bool = True):
+    def set_greater_equal(self, value: str, parsed, force: bool = True):
+        parsed = _as_key(parsed)
+
         if self.eq:
             if parsed <= self._eq:
                 return
@@ -327,6 +738,9 @@ class VersionRange:
             raise ValueError(f"Unknown comparator: {cmp}")
 
     def __eq__(self, other) -> bool:
+        if not isinstance(other, VersionRange):
+            return NotImplemented
+
         return all(
             [
                 self.eq == other.eq,
@@ -337,6 +751,35 @@ class VersionRange:
             ]
         )
 
+    def copy(self):
+        """
+        Return a copy. The bounds (strings and parsed versions) are immutable and shared.
+        """
+        ret = VersionRange.__new__(VersionRange)
+        ret.eq = self.eq
+        ret.lt = self.lt
+        ret.le = self.le
+        ret.gt = self.gt
+        ret.ge = self.ge
+        ret._eq = self._eq
+        ret._lt = self._lt
+        ret._le = self._le
+        ret._gt = self._gt
+        ret._ge = self._ge
+        return ret
+
+    def canonical(self) -> tuple:
+        """
+        Canonical form: the ends of the range on the line of comparison keys.
+        Ranges have the same canonical form if they are the same (see :py:func:`same`),
+        however their bounds are written (e.g. ``==1.2`` and ``==1.2.0``).
+        """
+        return _range_interval(self)
+
+    def __hash__(self) -> int:
+        # ranges that are ``==`` (same strings) are also the same range (see :py:func:`same`)
+        return hash(_range_interval(self))
+
     def same(self, other) -> bool:
         """
         Return True if the two VersionSpecs point to the same range,
@@ -381,241 +824,571 @@ class VersionRange:
     def __concat__(self, other):
         return _mymerge(self, other)
 
-    def __contains__(self, other):
-        if self == other:
-            return True
+    def __reduce__(self):
+        # pickle only the strings (the comparison keys are recomputed)
+        return (_range_from_strings, (self.eq, self.lt, self.le, self.gt, self.ge))
 
-        if self.eq:
-            if other.eq:
-                return self.eq == other.eq
-            return False
+    def __contains__(self, other):
+        """
+        ``other in self``: ``True`` if all versions in ``other`` are also in ``self``
+        (e.g. ``<1.0`` is not in ``>=1.0``, and ``<1.4`` is not in ``>=1.2``).
+        ``==`` ranges are only in each other if they are written the same
+        (``==1.2`` is not in ``==1.2.0``), use :py:func:`subset` to compare ranges only.
+        """
+        if _merge_caches is None:
+            return _contains(self, other)
+
+        return _merge_caches["contains"].call(
+            self.eq,
+            self.lt,
+            self.le,
+            self.gt,
+            self.ge,
+            other.eq,
+            other.lt,
+            other.le,
+            other.gt,
+            other.ge,
+        )
 
-        if other.eq:
-            if other._eq >= self._lt:
-                return False
-            if other._eq > self._le:
-                return False
-            if other._eq <= self._gt:
-                return False
-            if other._eq < self._ge:
-                return False
-            return True
 
-        if other._lt > self._le and other.lt:
-            return False
-        if other._le >= self._lt and other.le:
-            return False
-        if other._ge <= self._gt and other.ge:
-            return False
-        if other._gt < self._ge and other.gt:
-            return False
+def _contains(a: VersionRange, b: VersionRange) -> bool:
+    """
+    Check if ``b`` is in ``a``, see :py:func:`VersionRange.__contains__`.
+    """
+    if a == b:
+        return True
 
-        if (self.ge or self.gt) and (self.lt or self.le):
-            if not (other.ge or other.gt) and (other.lt or other.le):
-                return False
+    if a.eq:
+        return a.eq == b.eq
 
-        lt = other._lt
-        le = other._le
-        gt = other._gt
-        ge = other._ge
-
-        if not other.lt:
-            lt = _MinInf
-        if not other.le:
-            le = _MinInf
-        if not other.gt:
-            gt = _PlusInf
-        if not other.ge:
-            ge = _PlusInf
-
-        if gt < self._gt:
-            return False
-        if ge < self._ge:
-            return False
-        if lt > self._lt:
-            return False
-        if le > self._le:
-            return False
+    lower, upper = _range_interval(a)
+    lower_b, upper_b = _range_interval(b)
+    return lower <= lower_b and upper_b <= upper
 
-        if any([self.lt, self.le, self.gt, self.ge]):
-            if not any([other.lt, other.le, other.gt, other.ge]):
-                return False
 
-        return True
+def _range_strings(rng: VersionRange) -> tuple:
+    """
+    Strings of the bounds ``(eq, lt, le, gt, ge)``, see :py:func:`_range_from_strings`.
+    """
+    return (rng.eq, rng.lt, rng.le, rng.gt, rng.ge)
 
 
-def _mymerge(a: VersionRange, b: VersionRange) -> VersionRange:
-    if a.isempty():
-        return b
+def _range_from_strings(eq: str, lt: str, le: str, gt: str, ge: str) -> VersionRange:
+    """
+    Rebuild a :py:class:`VersionRange` from its (already consistent) bounds, without validation.
+    """
+    ret = VersionRange.__new__(VersionRange)
+    ret.eq = eq
+    ret.lt = lt
+    ret.le = le
+    ret.gt = gt
+    ret.ge = ge
+    ret._eq = _version_key(eq) if eq else _PlusInf
+    ret._lt = _version_key(lt) if lt else _PlusInf
+    ret._le = _version_key(le) if le else _PlusInf
+    ret._gt = _version_key(gt) if gt else _MinInf
+    ret._ge = _version_key(ge) if ge else _MinInf
+    return ret
 
-    if b.isempty():
-        return a
 
-    if a._lt < b._lt and a._le < b._le and a._gt > b._gt and a._ge > b._ge:
-        return a
+_open_lower = (_MinInf, 0)
+_open_upper = (_PlusInf, 0)
 
-    elif b._lt < a._lt and b._le < a._le and b._gt > a._gt and b._ge > a._ge:
-        return b
 
-    if a.eq and b.eq:
-        if a._eq == b._eq:
-            return a
-        else:
-            raise ValueError(f"Version clash: ={a.eq} and ={b.eq}")
+def _range_interval(rng: VersionRange) -> tuple:
+    """
+    Interval of a range with ends on an extended line of comparison keys, such that
+    version ``v`` (at ``(key, 0)``) is in the range if ``lower <= (key, 0) <= upper``.
+    Lower: ``>=v`` -> ``(key, 0)``, ``>v`` -> ``(key, 1)``.
+    Upper: ``<=v`` -> ``(key, 0)``, ``<v`` -> ``(key, -1)``.
 
-    ret = copy.deepcopy(a)
+    :param rng: Version range.
+    :return: ``(lower, upper)``.
+    """
+    if rng.eq:
+        point = (rng._eq, 0)
+        return point, point
+
+    if rng.ge:
+        lower = (rng._ge, 0)
+    elif rng.gt:
+        lower = (rng._gt, 1)
+    else:
+        lower = _open_lower
 
-    if b.lt:
-        ret.set_less(b.lt, b._lt, False)
-    if b.le:
-        ret.set_less_equal(b.le, b._le, False)
-    if b.gt:
-        ret.set_greater(b.gt, b._gt, False)
-    if b.ge:
-        ret.set_greater_equal(b.ge, b._ge, False)
-    if b.eq:
-        ret.set_equal(b.eq, b._eq, False)
+    if rng.le:
+        upper = (rng._le, 0)
+    elif rng.lt:
+        upper = (rng._lt, -1)
+    else:
+        upper = _open_upper
 
-    return ret
+    return lower, upper
 
 
-def _interpret(dependency: str) -> dict:
+def _range_new(lower: tuple, upper: tuple, lower_str: str, upper_str: str) -> VersionRange:
     """
-    Interpret a version string.
-
-    :param dependency: Dependency specifier.
-    :return: Dictionary with keys 'name', 'range', and optionally 'wildcard', 'build'.
+    Range from the ends of its interval (see :py:func:`_range_interval`) and their strings
+    (``None`` for an open end), without validation.
     """
+    ret = VersionRange.__new__(VersionRange)
+    ret.eq = None
+    ret.lt = None
+    ret.le = None
+    ret.gt = None
+    ret.ge = None
+    ret._eq = _PlusInf
+    ret._lt = _PlusInf
+    ret._le = _PlusInf
+    ret._gt = _MinInf
+    ret._ge = _MinInf
+
+    if lower == upper:
+        ret.eq = lower_str
+        ret._eq = lower[0]
+        return ret
+
+    if lower_str is None:
+        pass
+    elif lower[1]:
+        ret.gt = lower_str
+        ret._gt = lower[0]
+    else:
+        ret.ge = lower_str
+        ret._ge = lower[0]
+
+    if upper_str is None:
+        pass
+    elif upper[1]:
+        ret.lt = upper_str
+        ret._lt = upper[0]
+    else:
+        ret.le = upper_str
+        ret._le = upper[0]
 
-    if dependency is None:
-        return {}
+    return ret
 
-    dep = dependency
 
-    if "#" in dep:
-        dep, comment = dep.split("#", 1)
-        warnings.warn(f"Comment '{comment}' ignored.", Warning)
+class _Empty:
+    """
+    Type of :py:data:`EMPTY`.
+    """
 
-    # foo ==1.0
+    __slots__ = ()
 
-    if re.match(r"^([^=^<^>^\s]*)(\s*)(==)(.*)$", dep):
-        _, name, _, eq, _, version, _ = re.split(r"^([^=^<^>^\s]*)(\s*)(==)(\s*)(.*)$", dep)
+    def __bool__(self) -> bool:
+        return False
 
-        if "=" in version:
-            raise ValueError(f"Invalid build specifier '{dep}'.")
+    def __repr__(self) -> str:
+        return "EMPTY"
 
-        return {
-            "name": name,
-            "wildcard": eq + version,
-            "range": VersionRange(equal=version),
-        }
+    def __reduce__(self):
+        return "EMPTY"
 
-    # foo =1.0=abc
 
-    if re.match(r"^([^=^<^>^\s]*)(\s*)([=]+)([^=^<^>^\s]*)(\s*)([=]+)(.*)$", dep):
-        _, name, _, eq, version, _, eq2, build, _ = re.split(
-            r"^([^=^<^>^\s]*)(\s*)([=]+)([^=^<^>^\s]*)(\s*)([=]+)(.*)$", dep
-        )
+EMPTY = _Empty()
+"""
+Result of :py:func:`intersect` for ranges without a version in common.
+"""
 
-        if eq != "=":
-            raise ValueError(f"Invalid version specification '{dep}'.")
 
-        if eq2 != "=":
-            raise ValueError(f"Invalid build specifier '{dep}'.")
+def intersect(a: VersionRange, b: VersionRange) -> VersionRange:
+    """
+    Intersection of two ranges, without raising on a clash.
+    Where both ranges have a bound at the same version, the longest string is kept
+    (that of ``b`` if they have equal length).
 
-        return {"name": name, "build": build, "range": VersionRange(equal=version)}
+    :param a: Version range.
+    :param b: Version range.
+    :return: Version range (may be ``a`` or ``b`` itself), or :py:data:`EMPTY`.
+    """
+    if a is EMPTY or b is EMPTY:
+        return EMPTY
 
-    # foo =1.0.*
+    if a.eq and b.eq:
+        return a if a._eq == b._eq else EMPTY
+
+    if a.eq or b.eq:
+        point, other = (a, b) if a.eq else (b, a)
+        lower, upper = _range_interval(other)
+        return point if lower <= (point._eq, 0) <= upper else EMPTY
+
+    lower_a, upper_a = _range_interval(a)
+    lower_b, upper_b = _range_interval(b)
+    lower_str_a = a.gt or a.ge
+    lower_str_b = b.gt or b.ge
+    upper_str_a = a.lt or a.le
+    upper_str_b = b.lt or b.le
+
+    if lower_a > lower_b:
+        lower, lower_str = lower_a, lower_str_a
+    elif lower_b > lower_a or len(lower_str_b or "") >= len(lower_str_a or ""):
+        lower, lower_str = lower_b, lower_str_b
+    else:
+        lower, lower_str = lower_a, lower_str_a
 
-    if re.match(r"^([^=^\s]*)(\s*)([=]+)([^\*]*)(\*)$", dep):
-        _, name, _, eq, _, basename, wildcard, _ = re.split(
-            r"^([^=^\s]*)(\s*)([=]*)(\s*)([^\*]*)(\*)$", dep
-        )
+    if upper_a < upper_b:
+        upper, upper_str = upper_a, upper_str_a
+    elif upper_b < upper_a or len(upper_str_b or "") >= len(upper_str_a or ""):
+        upper, upper_str = upper_b, upper_str_b
+    else:
+        upper, upper_str = upper_a, upper_str_a
 
-        if eq != "=":
-            raise ValueError(f"Invalid wildcard dependency '{dep}'.")
+    if lower > upper:
+        return EMPTY
 
-        if len(basename.split(".")) == 0:
-            lower = basename
-            upper = f"{int(lower) + 1}"
+    if lower == upper:
+        # ``>=v`` and ``<=v`` meet: ``==v`` written as the bound of ``b`` that closes the range
+        if upper_b == upper and upper_a != upper:
+            lower_str = upper_str_b
         else:
-            lower = basename.rstrip(".")
-            if len(lower.split(".")) == 1:
-                upper = f"{int(lower) + 1}"
-                if basename[-1] == ".":
-                    upper += ".0"
-            else:
-                base, minor = lower.rsplit(".", 1)
-                upper = f"{base}.{int(minor) + 1}.0"
+            lower_str = lower_str_b
 
-        if len(lower) == 0:
-            lower = "0"
-        else:
-            lower = f"{lower}.0"
+    return _range_new(lower, upper, lower_str, upper_str)
 
-        return {
-            "name": name,
-            "wildcard": eq + basename + wildcard,
-            "range": VersionRange(greater_equal=lower, less=upper),
-        }
 
-    # foo =1.0
+def is_disjoint(a: VersionRange, b: VersionRange) -> bool:
+    """
+    Check if two ranges have no version in common.
 
-    if re.match(r"^([^=^<^>^\s]*)(\s*)([=]+)([^=^<^>^\s]*)$", dep):
-        _, name, _, eq, basename, _ = re.split(r"^([^=^\s]*)(\s*)([=]+)(.*)$", dep)
+    :param a: Version range.
+    :param b: Version range.
+    :return: ``True`` if the ranges are disjoint.
+    """
+    if a is EMPTY or b is EMPTY:
+        return True
 
-        if eq != "=":
-            raise ValueError(f"Invalid version specification '{dep}'.")
+    lower_a, upper_a = _range_interval(a)
+    lower_b, upper_b = _range_interval(b)
+    return lower_a > upper_b or lower_b > upper_a
 
-        if len(basename.split(".")) == 0:
-            lower = basename
-            upper = f"{int(lower) + 1}"
-        else:
-            lower = basename.rstrip(".")
-            if len(lower.split(".")) == 1:
-                upper = f"{int(lower) + 1}"
-                if basename[-1] == ".":
-                    upper += ".0"
-            else:
-                base, minor = lower.rsplit(".", 1)
-                upper = f"{base}.{int(minor) + 1}.0"
 
-        if len(lower) == 0:
-            lower = "0"
-        else:
-            lower = f"{lower}.0"
+def subset(a: VersionRange, b: VersionRange) -> bool:
+    """
+    Check if all versions in range ``a`` are in range ``b``.
+    Unlike ``a in b``, ``==1.2`` and ``==1.2.0`` are the same range.
 
-        return {
-            "name": name,
-            "wildcard": eq + basename,
-            "range": VersionRange(greater_equal=lower, less=upper),
-        }
+    :param a: Version range.
+    :param b: Version range.
+    :return: ``True`` if ``a`` is a subset of ``b``.
+    """
+    if a is EMPTY:
+        return True
 
-    # foo *
+    if b is EMPTY:
+        return False
 
-    if re.match(r"^([^\*^\s]*)(\s*)(\*)$", dep):
-        _, name, _, wildcard, _ = re.split(r"^([^\*^\s]*)(\s*)(\*)$", dep)
-        return {"name": name, "wildcard": wildcard, "range": VersionRange()}
+    lower_a, upper_a = _range_interval(a)
+    lower_b, upper_b = _range_interval(b)
+    return lower_b <= lower_a and upper_a <= upper_b
 
-    # foo
-    # foo =1.0
-    # foo >1.0
-    # foo >=1.0
-    # foo <1.0
-    # foo <=1.0
-    # foo >1.0, <2.0
-    # foo >=1.0, <2.0
-    # foo >1.0, <=2.0
-    # foo >=1.0, <=2.0
 
-    _, name, _, eq, _, ver, _ = re.split(r"^([^>^<^=^\s]*)(\s*)([<>=]*)(\s*)(.*)$", dep)
-    eq2 = None
-    ver2 = None
-    sp = re.split(r"^([^,]*)(,)(\s*)([<>=]*)(\s*)(.*)$", ver)
-    if len(sp) > 1:
-        _, ver, _, _, eq2, _, ver2, _ = sp
+def union(*args: list[VersionRange]) -> list[VersionRange]:
+    """
+    Union of ranges as a normalised list of ranges:
+    sorted, without overlapping or adjacent (e.g. ``<1`` and ``>=1``) ranges.
 
-    ret = {"name": name, "range": VersionRange()}
+    :param args: Version ranges.
+    :return: List of version ranges.
+    """
+    intervals = []
+
+    for rng in args:
+        if rng is EMPTY:
+            continue
+        lower, upper = _range_interval(rng)
+        intervals.append((lower, upper, rng.eq or rng.gt or rng.ge, rng.eq or rng.lt or rng.le))
+
+    intervals.sort(key=lambda item: item[0])
+    merged = []
+
+    for lower, upper, lower_str, upper_str in intervals:
+        if merged:
+            prev = merged[-1]
+            touch = lower[0] == prev[1][0] and lower[1] - prev[1][1] == 1
+            if lower <= prev[1] or touch:
+                if upper > prev[1]:
+                    merged[-1] = (prev[0], upper, prev[2], upper_str)
+                continue
+        merged.append((lower, upper, lower_str, upper_str))
+
+    return [_range_new(*item) for item in merged]
+
+
+def _mymerge(a: VersionRange, b: VersionRange) -> VersionRange:
+    if a.isempty():
+        return b
+
+    if b.isempty():
+        return a
+
+    if _merge_caches is None:
+        ret = intersect(a, b)
+        if ret is b:
+            ret = b.copy()
+    else:
+        ret = _merge_caches["merge"].call(
+            a.eq, a.lt, a.le, a.gt, a.ge, b.eq, b.lt, b.le, b.gt, b.ge
+        )
+        if ret is not EMPTY:
+            ret = ret.copy()
+
+    if ret is EMPTY:
+        raise ValueError(f"Version clash: {a} and {b}")
+
+    return ret
+
+
+def _merge_bounds(*bounds: list[str]) -> VersionRange:
+    """
+    :py:func:`intersect` of two ranges given by their bounds ``(eq, lt, le, gt, ge, eq, ...)``.
+    """
+    return intersect(_range_from_strings(*bounds[:5]), _range_from_strings(*bounds[5:]))
+
+
+def _contains_bounds(*bounds: list[str]) -> bool:
+    """
+    :py:func:`_contains` of two ranges given by their bounds ``(eq, lt, le, gt, ge, eq, ...)``.
+    """
+    return _contains(_range_from_strings(*bounds[:5]), _range_from_strings(*bounds[5:]))
+
+
+def _make_merge_caches(maxsize: int) -> dict:
+    """
+    Memoised :py:func:`_merge_bounds` and :py:func:`_contains_bounds` (``None`` if disabled).
+    The bounds are strings that also define the comparison keys, and the result (for example
+    which string is kept on equal bounds) depends on them.
+    Cached ranges are private: they are handed out as copies.
+    """
+    if maxsize <= 0:
+        return None
+
+    return {
+        "merge": _MemoCache(_merge_bounds, maxsize),
+        "contains": _MemoCache(_contains_bounds, maxsize),
+    }
+
+
+_merge_caches = _make_merge_caches(16384)
+
+
+def merge_cache_info() -> dict[CacheInfo]:
+    """
+    Statistics of the caches of merged ranges (used by ``+``) and of containment checks
+    (used by ``in``) of :py:class:`VersionRange` and :py:class:`PackageSpecifier`.
+
+    :return: ``{"merge": CacheInfo(...), "contains": CacheInfo(...)}``, each
+        ``CacheInfo(hits, misses, evictions, maxsize, currsize)`` (all zero if disabled).
+    """
+    if _merge_caches is None:
+        return {key: CacheInfo(0, 0, 0, 0, 0) for key in ["merge", "contains"]}
+
+    return {key: cache.info() for key, cache in _merge_caches.items()}
+
+
+def merge_cache_clear():
+    """
+    Empty the cache of merged ranges and containment checks and reset its statistics.
+    """
+    if _merge_caches is not None:
+        for cache in _merge_caches.values():
+            cache.clear()
+
+
+def merge_cache_resize(maxsize: int):
+    """
+    Replace the cache of merged ranges and containment checks by an empty one of a different size.
+
+    :param maxsize: Maximum number of entries (of merges and of containment checks each).
+        ``0`` disables the cache.
+    """
+    global _merge_caches
+    _merge_caches = _make_merge_caches(maxsize)
+
+
+@contextlib.contextmanager
+def merge_cache(maxsize: int = 16384):
+    """
+    Context manager to use an empty cache of merged ranges and containment checks of a given size
+    (``0`` disables caching). For example::
+
+        with conda_envfile.merge_cache(maxsize=0):
+            ...
+
+    The previous cache (with its entries) is restored when leaving the context.
+
+    :param maxsize: Maximum number of entries (of merges and of containment checks each).
+    """
+    global _merge_caches
+    previous = _merge_caches
+    _merge_caches = _make_merge_caches(maxsize)
+    try:
+        yield
+    finally:
+        _merge_caches = previous
+
+
+_re_specifier = re.compile(
+    r"""
+    ^(?:
+        # foo ==1.0
+        (?P<eq_name>[^=^<^>^\s]*)\s*(?P<eq_op>==)\s*(?P<eq_version>.*)
+    |
+        # foo =1.0=abc
+        (?P<build_name>[^=^<^>^\s]*)\s*(?P<build_op>=+)(?P<build_version>[^=^<^>^\s]*)
+        \s*(?P<build_op2>=+)(?P<build>.*)
+    |
+        # foo =1.0.*
+        (?P<wild_name>[^=^\s]*)\s*(?P<wild_op>=+)\s*(?P<wild_version>[^\*]*)\*
+    |
+        # foo =1.0
+        (?P<fuzzy_name>[^=^<^>^\s]*)\s*(?P<fuzzy_op>=+)(?P<fuzzy_version>[^=^<^>^\s]*)
+    |
+        # foo *
+        (?P<any_name>[^\*^\s]*)\s*\*
+    |
+        # foo
+        # foo >1.0
+        # foo >=1.0, <2.0
+        (?P<name>[^>^<^=^\s]*)\s*(?P<op>[<>=]*)\s*
+        (?:
+            (?P<version>[^,]*),\s*(?P<op2>[<>=]*)\s*(?P<version2>.*)
+        |
+            (?P<version_only>.*)
+        )
+    )$
+    """,
+    re.VERBOSE,
+)
+
+
+def _wildcard_bounds(basename: str) -> tuple[str, str]:
+    """
+    Lower and upper bound of a fuzzy version, e.g. ``1.0`` -> ``1.0.0``, ``1.1.0``.
+
+    :param basename: Version without the trailing wildcard.
+    :return: ``(lower, upper)``.
+    """
+    lower = basename.rstrip(".")
+    if len(lower.split(".")) == 1:
+        upper = f"{int(lower) + 1}"
+        if basename[-1] == ".":
+            upper += ".0"
+    else:
+        base, minor = lower.rsplit(".", 1)
+        upper = f"{base}.{int(minor) + 1}.0"
+
+    if len(lower) == 0:
+        lower = "0"
+    else:
+        lower = f"{lower}.0"
+
+    return lower, upper
+
+
+def _interpret(dependency: str) -> dict:
+    """
+    Interpret a version string.
+    The specifier is classified and split by a single (precompiled) regular expression.
+
+    :param dependency: Dependency specifier.
+    :return: Dictionary with keys 'name', 'range', and optionally 'wildcard', 'build'.
+    """
+
+    if dependency is None:
+        return {}
+
+    dep = dependency
+
+    if "#" in dep:
+        dep, comment = dep.split("#", 1)
+        warnings.warn(f"Comment '{comment}' ignored.", Warning)
+
+    m = _re_specifier.match(dep)
+
+    if m is None:
+        raise ValueError(f"Invalid specifier '{dep}'.")
+
+    # foo ==1.0
+
+    if m["eq_op"] is not None:
+        version = m["eq_version"]
+
+        if "=" in version:
+            raise ValueError(f"Invalid build specifier '{dep}'.")
+
+        return {
+            "name": m["eq_name"],
+            "wildcard": "==" + version,
+            "range": VersionRange(equal=version),
+        }
+
+    # foo =1.0=abc
+
+    if m["build_op"] is not None:
+        if m["build_op"] != "=":
+            raise ValueError(f"Invalid version specification '{dep}'.")
+
+        if m["build_op2"] != "=":
+            raise ValueError(f"Invalid build specifier '{dep}'.")
+
+        return {
+            "name": m["build_name"],
+            "build": m["build"],
+            "range": VersionRange(equal=m["build_version"]),
+        }
+
+    # foo =1.0.*
+
+    if m["wild_op"] is not None:
+        if m["wild_op"] != "=":
+            raise ValueError(f"Invalid wildcard dependency '{dep}'.")
+
+        basename = m["wild_version"]
+        lower, upper = _wildcard_bounds(basename)
+
+        return {
+            "name": m["wild_name"],
+            "wildcard": "=" + basename + "*",
+            "range": VersionRange(greater_equal=lower, less=upper),
+        }
+
+    # foo =1.0
+
+    if m["fuzzy_op"] is not None:
+        if m["fuzzy_op"] != "=":
+            raise ValueError(f"Invalid version specification '{dep}'.")
+
+        basename = m["fuzzy_version"]
+        lower, upper = _wildcard_bounds(basename)
+
+        return {
+            "name": m["fuzzy_name"],
+            "wildcard": "=" + basename,
+            "range": VersionRange(greater_equal=lower, less=upper),
+        }
+
+    # foo *
+
+    if m["any_name"] is not None:
+        return {"name": m["any_name"], "wildcard": "*", "range": VersionRange()}
+
+    # foo
+    # foo >1.0
+    # foo >=1.0, <2.0
+
+    eq = m["op"]
+    eq2 = m["op2"]
+
+    if eq2 is None:
+        ver = m["version_only"]
+        ver2 = None
+    else:
+        ver = m["version"]
+        ver2 = m["version2"]
+
+    ret = {"name": m["name"], "range": VersionRange()}
 
     if eq == "=" and eq2:
         raise ValueError(f"Cannot have two equalities in '{dep}'")
@@ -632,6 +1405,9 @@ def _interpret(dependency: str) -> dict:
     return ret
 
 
+_specifier_cache = _LRUCache(maxsize=16384)
+
+
 def _merge_property(a, b):
     if a is None:
         return b
@@ -678,16 +1454,37 @@ class PackageSpecifier:
             self.name = interpret.name
             self.wildcard = interpret.wildcard
             self.build = interpret.build
-            self.range = copy.deepcopy(interpret.range)
+            self.range = interpret.range.copy()
         else:
             self._interpret(interpret)
 
+    def copy(self):
+        """
+        Return a copy.
+        """
+        return PackageSpecifier(self)
+
     def _interpret(self, dependency: str):
-        data = _interpret(dependency)
-        self.name = data.pop("name", None)
-        self.wildcard = data.pop("wildcard", None)
-        self.build = data.pop("build", None)
-        self.range = data.pop("range", None)
+        # parsed specifiers are interned as immutable tuples,
+        # each instance gets its own copy of the range as it can be modified in-place
+        # (comments are not cached such that they always warn)
+        if not isinstance(dependency, str) or "#" in dependency:
+            data = _interpret(dependency)
+            self.name = data.pop("name", None)
+            self.wildcard = data.pop("wildcard", None)
+            self.build = data.pop("build", None)
+            self.range = data.pop("range", None)
+            return
+
+        parsed = _specifier_cache.get(dependency)
+
+        if parsed is None:
+            data = _interpret(dependency)
+            parsed = (data["name"], data.get("wildcard"), data.get("build"), data["range"])
+            _specifier_cache.put(dependency, parsed)
+
+        self.name, self.wildcard, self.build, rng = parsed
+        self.range = rng.copy()
 
     @property
     def version(self) -> str:
@@ -703,8 +1500,19 @@ class PackageSpecifier:
         self._interpret(self.name + " " + value)
 
     def __eq__(self, other) -> bool:
+        """
+        Return True if the two specifiers are written the same (see :py:func:`same`).
+        A string is first interpreted as a specifier: ``PackageSpecifier("foo") == "foo"``.
+        Note that a string does not hash like the specifier it is equal to:
+        do not mix strings and specifiers as keys of a set or dict.
+
+        :param other: Specifier (or string).
+        :return: ``True`` if the specifiers are equal.
+        """
         if isinstance(other, str):
             other = PackageSpecifier(other)
+        elif not isinstance(other, PackageSpecifier):
+            return NotImplemented
 
         return all(
             [
@@ -715,6 +1523,32 @@ class PackageSpecifier:
             ]
         )
 
+    def canonical(self) -> tuple:
+        """
+        Canonical form: ``(name, range, build)``, with ``range`` the canonical form of the
+        version range (see :py:func:`VersionRange.canonical`).
+        Specifiers have the same canonical form if they are the same (see :py:func:`same`).
+        """
+        return (self.name, _range_interval(self.range), self.build)
+
+    def same(self, other) -> bool:
+        """
+        Return True if the two specifiers have the same name, version range, and build,
+        ignoring how they are written (e.g. ``foo =1.2`` and ``foo >=1.2, <1.3``).
+        Use ``==`` to compare how they are written.
+
+        :param other: Specifier (or string).
+        :return: ``True`` if the specifiers are the same.
+        """
+        if isinstance(other, str):
+            other = PackageSpecifier(other)
+
+        return self.canonical() == other.canonical()
+
+    def __hash__(self) -> int:
+        # specifiers that are ``==`` are also :py:func:`same`, not so for strings (see ``__eq__``)
+        return hash(self.canonical())
+
     def __str__(self):
         if self.wildcard:
             return f"{self.name} {self.wildcard}"
@@ -783,246 +1617,1695 @@ class PackageSpecifier:
         return other.range in self.range
 
 
+def specifier_cache_info() -> CacheInfo:
+    """
+    Statistics of the cache of parsed specifiers used by :py:class:`PackageSpecifier`.
+
+    :return: ``CacheInfo(hits, misses, evictions, maxsize, currsize)``.
+    """
+    return _specifier_cache.info()
+
+
+def specifier_cache_clear():
+    """
+    Empty the cache of parsed specifiers and reset its statistics.
+    """
+    _specifier_cache.clear()
+
+
+def specifier_cache_resize(maxsize: int):
+    """
+    Change the maximum number of parsed specifiers that are cached.
+
+    :param maxsize: Maximum number of entries (``0`` disables the cache).
+    """
+    _specifier_cache.resize(maxsize)
+
+
+# name of a specifier: everything up to the first operator or whitespace
+_re_name = re.compile(r"[^=<>\s\*\^#]*")
+
+
+def _specifier_name(dep) -> str:
+    """
+    Name of a dependency, without interpreting the version (which is not validated).
+    Specifiers with ``*`` or a comment are fully interpreted (to follow the same rules).
+
+    :param dep: Dependency (text or PackageSpecifier).
+    :return: Name.
+    """
+    if isinstance(dep, PackageSpecifier):
+        return dep.name
+
+    if not isinstance(dep, str) or "*" in dep or "#" in dep:
+        return PackageSpecifier(dep).name
+
+    return _re_name.match(dep).group()
+
+
+def iter_remove(dependencies, *args: list[str]):
+    """
+    Remove dependencies, see :py:func:`remove`.
+
+    :param dependencies: Iterable of dependencies.
+    :param args: List of dependencies to remove (version specification is ignored).
+    :return: Generator of dependencies.
+    """
+    rm = set(map(_specifier_name, args))
+
+    for dep in dependencies:
+        if _specifier_name(dep) not in rm:
+            yield dep
+
+
 def remove(dependencies: list[str], *args: list[str]) -> list[str]:
     """
     Remove dependencies.
+    Only the names of the dependencies are read (see :py:func:`iter_remove` for a generator).
 
     :param dependencies: List of dependencies.
     :param args: List of dependencies to remove (version specification is ignored).
     :return: List of dependencies.
     """
+    return list(iter_remove(dependencies, *args))
+
+
+def _unique(*args) -> dict[PackageSpecifier]:
+    """
+    Return dictionary with unique, most restrictive, dependencies.
+    """
+    deps = defaultdict(PackageSpecifier)
+
+    for dep in args:
+        dep = PackageSpecifier(dep)
+        deps[dep.name] += dep
+
+    return deps
+
+
+def unique(*args) -> list[PackageSpecifier]:
+    """
+    Return a list of 'unique' dependencies. If multiple dependencies with the same name are given,
+    the most restrictive version specification is returned.
+
+    :param args: Dependencies to merge.
+    :return: List of unique dependencies (convert to strings: ``list(map(str, unique(*args)))``)
+    """
+    deps = _unique(*args)
+    return [deps[key] for key in sorted(deps, key=lambda x: x.lower())]
 
-    ret = []
-    rm = [PackageSpecifier(i).name for i in args]
+
+def _specifier_state(dep: PackageSpecifier) -> tuple:
+    """
+    Tuple of all strings that define a :py:class:`PackageSpecifier` (the result of a merge only
+    depends on these).
+    """
+    r = dep.range
+    return (dep.name, dep.wildcard, dep.build, r.eq, r.lt, r.le, r.gt, r.ge)
+
+
+def unique_many(dependencies) -> list[PackageSpecifier]:
+    """
+    Same as :py:func:`unique`, but optimised for a very large number of (often repeated)
+    dependencies, e.g. when aggregating many lock-files.
+    Each distinct dependency is parsed once and dependencies are folded per name.
+    Since the result of a merge only depends on the two operands, each distinct merge
+    is computed once: all others are a dictionary lookup.
+    The result is identical to that of :py:func:`unique`.
+
+    :param dependencies: Iterable of dependencies (may be a generator).
+    :return: List of unique dependencies.
+    """
+    states = {}  # raw dependency -> state
+    specs = {}  # state -> PackageSpecifier
+    merged = {}  # (state, state) -> state
+    current = {}  # name -> state
 
     for dep in dependencies:
-        if PackageSpecifier(dep).name not in rm:
-            ret.append(dep)
+        key = dep if isinstance(dep, str) else _specifier_state(dep)
+        state = states.get(key)
 
-    return ret
+        if state is None:
+            spec = PackageSpecifier(dep)
+            state = _specifier_state(spec)
+            states[key] = state
+            specs.setdefault(state, spec)
 
+        name = state[0]
+        cur = current.get(name)
 
-def _unique(*args) -> dict[PackageSpecifier]:
+        if cur is None:
+            current[name] = state
+            continue
+
+        ret = merged.get((cur, state))
+
+        if ret is None:
+            spec = PackageSpecifier(specs[cur]) + PackageSpecifier(specs[state])
+            ret = _specifier_state(spec)
+            specs.setdefault(ret, spec)
+            merged[(cur, state)] = ret
+
+        current[name] = ret
+
+    return [specs[current[key]] for key in sorted(current, key=lambda x: x.lower())]
+
+
+class MergeIndex:
     """
-    Return dictionary with unique, most restrictive, dependencies.
+    Merge dependencies from several sources (e.g. files) such that sources can be added and
+    removed later::
+
+        index = MergeIndex()
+        index.add("a.yml", ["foo >=1.0", "bar"])
+        index.add("b.yml", ["foo <2.0"])
+        print(index["foo"])  # foo >=1.0, <2.0
+        index.remove("b.yml")
+        print(index["foo"])  # foo >=1.0
+
+    For each name, the bounds of all sources are kept in sorted lists,
+    such that the merged (most restrictive) range follows from the ends of the lists,
+    and finding a bound is a binary search.
+    Inserting or deleting a bound shifts the list, i.e. it costs ``O(n)`` for ``n`` bounds
+    of that name (a memory move, negligible compared to parsing for any realistic number of
+    sources).
+
+    The merged range is the same as that of :py:func:`unique`, but it does not depend on the
+    order of the sources. If the same bound is written differently (e.g. ``1.2`` and ``1.2.0``),
+    the longest string is used (likewise for wildcards with the same range).
     """
-    deps = defaultdict(PackageSpecifier)
 
-    for dep in args:
-        dep = PackageSpecifier(dep)
-        deps[dep.name] += dep
+    def __init__(self):
+        self._upper = defaultdict(list)  # name -> sorted [(key, closed, -len(version), version)]
+        self._lower = defaultdict(list)  # name -> sorted [(key, open, len(version), version)]
+        self._equal = defaultdict(list)  # name -> sorted [(key, len(version), version)]
+        self._extra = defaultdict(Counter)  # name -> {(range-keys, wildcard, build): count}
+        self._count = Counter()  # name -> number of specifiers
+        self._sources = {}
+        self._merged = {}
+
+    @staticmethod
+    def _bounds(dep: PackageSpecifier) -> list[tuple]:
+        """
+        Sorted-list entries of a specifier: ``[(container, entry), ...]``.
+        """
+        rng = dep.range
+        ret = []
+        if rng.eq:
+            ret.append(("_equal", (rng._eq, len(rng.eq), rng.eq)))
+        if rng.lt:
+            ret.append(("_upper", (rng._lt, 0, -len(rng.lt), rng.lt)))
+        if rng.le:
+            ret.append(("_upper", (rng._le, 1, -len(rng.le), rng.le)))
+        if rng.gt:
+            ret.append(("_lower", (rng._gt, 1, len(rng.gt), rng.gt)))
+        if rng.ge:
+            ret.append(("_lower", (rng._ge, 0, len(rng.ge), rng.ge)))
+        return ret
+
+    def _insert(self, deps: list[PackageSpecifier]):
+        for dep in deps:
+            self._count[dep.name] += 1
+            for container, entry in self._bounds(dep):
+                bisect.insort(getattr(self, container)[dep.name], entry)
+            if dep.wildcard or dep.build:
+                self._extra[dep.name][(dep.range.canonical(), dep.wildcard, dep.build)] += 1
+
+    def _retract(self, deps: list[PackageSpecifier]):
+        for dep in deps:
+            self._count[dep.name] -= 1
+            for container, entry in self._bounds(dep):
+                entries = getattr(self, container)[dep.name]
+                del entries[bisect.bisect_left(entries, entry)]
+            if dep.wildcard or dep.build:
+                extra = self._extra[dep.name]
+                key = (dep.range.canonical(), dep.wildcard, dep.build)
+                extra[key] -= 1
+                if extra[key] == 0:
+                    del extra[key]
+
+    def _compute(self, name: str) -> PackageSpecifier:
+        """
+        Merged specifier of a name, or ``None`` if no source has the name.
+        """
+        if self._count[name] == 0:
+            for container in [self._upper, self._lower, self._equal, self._extra, self._count]:
+                container.pop(name, None)
+            return None
+
+        upper = self._upper[name][0] if self._upper[name] else None
+        lower = self._lower[name][-1] if self._lower[name] else None
+        eq = lt = le = gt = ge = None
+
+        if self._equal[name]:
+            first = self._equal[name][0]
+            key, _, eq = self._equal[name][-1]
+            if first[0] != key:
+                raise ValueError(f"Version clash: ={first[2]} and ={eq}")
+            if upper and (key > upper[0] or (key == upper[0] and not upper[1])):
+                raise ValueError(f"Version clash: ={eq}")
+            if lower and (key < lower[0] or (key == lower[0] and lower[1])):
+                raise ValueError(f"Version clash: ={eq}")
+        else:
+            if upper:
+                if upper[1]:
+                    le = upper[3]
+                else:
+                    lt = upper[3]
+            if lower:
+                if lower[1]:
+                    gt = lower[3]
+                else:
+                    ge = lower[3]
+            if upper and lower:
+                if lower[0] > upper[0] or (lower[0] == upper[0] and not (le and ge)):
+                    raise ValueError(f"Version clash: {lt or le} and {gt or ge}")
+                if lower[0] == upper[0]:
+                    eq = ge if len(ge) > len(le) else le
+                    lt = le = gt = ge = None
+
+        ret = PackageSpecifier()
+        ret.name = name
+        ret.range = _range_from_strings(eq, lt, le, gt, ge)
+
+        keys = ret.range.canonical()
+        wildcards = set(w for (k, w, _) in self._extra[name] if k == keys and w)
+        builds = set(b for (k, _, b) in self._extra[name] if k == keys and b)
+
+        if len(builds) > 1:
+            raise ValueError(f"Build clash: {name} {' and '.join(sorted(builds))}")
+
+        # different wildcards of the same range (e.g. "=1.2" and "=1.2.*"): use the longest
+        if wildcards:
+            ret.wildcard = max(wildcards, key=lambda x: (len(x), x))
+        if builds:
+            ret.build = builds.pop()
+
+        return ret
+
+    def _update(self, names: set[str]):
+        """
+        Recompute the merged specifiers of names (nothing is changed if any of them clashes).
+        """
+        merged = {name: self._compute(name) for name in names}
+
+        for name, dep in merged.items():
+            if dep is None:
+                self._merged.pop(name, None)
+            else:
+                self._merged[name] = dep
+
+    def add(self, source, specs: list[str]) -> set[str]:
+        """
+        Add (or replace) the dependencies of a source.
+        If the result has a version clash, the index is left unchanged.
+
+        :param source: Identifier of the source (e.g. a filename).
+        :param specs: List of dependencies.
+        :return: Names of the dependencies whose merged specification is recomputed.
+        """
+        deps = [PackageSpecifier(i) for i in specs]
+        old = self._sources.get(source, [])
+        names = set(i.name for i in deps) | set(i.name for i in old)
+
+        self._retract(old)
+        self._insert(deps)
+
+        try:
+            self._update(names)
+        except ValueError:
+            self._retract(deps)
+            self._insert(old)
+            raise
+
+        self._sources[source] = deps
+        return names
+
+    def remove(self, source) -> set[str]:
+        """
+        Remove the dependencies of a source.
+
+        :param source: Identifier of the source (as used in :py:func:`MergeIndex.add`).
+        :return: Names of the dependencies whose merged specification is recomputed.
+        """
+        deps = self._sources.pop(source)
+        names = set(i.name for i in deps)
+        self._retract(deps)
+        self._update(names)
+        return names
+
+    @property
+    def sources(self) -> list:
+        """
+        Sources (in the order in which they were added).
+        """
+        return list(self._sources)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._merged
+
+    def __getitem__(self, name: str) -> PackageSpecifier:
+        return self._merged[name].copy()
+
+    def __len__(self) -> int:
+        return len(self._merged)
+
+    def dependencies(self) -> list[PackageSpecifier]:
+        """
+        Merged dependencies (sorted by name), see :py:func:`unique`.
+
+        :return: List of dependencies.
+        """
+        keys = sorted(self._merged, key=lambda x: x.lower())
+        return [self._merged[key].copy() for key in keys]
+
+
+class RestrictionIndex:
+    """
+    Most restrictive version specification per name, to restrict many sources against the
+    same dependencies (see :py:func:`restrict`)::
+
+        index = RestrictionIndex.from_specs(parse_file("pins.yml")["dependencies"])
+        for source in sources:
+            restricted = index.restrict(source)
+
+    :param restriction: Dictionary ``{name: PackageSpecifier, ...}``.
+    """
+
+    def __init__(self, restriction: dict[PackageSpecifier] = None):
+        self._restriction = dict(restriction or {})
+
+    @classmethod
+    def from_specs(cls, other: list[str]):
+        """
+        Build the index from dependencies, see :py:func:`unique`.
+
+        :param other: List of dependencies.
+        :return: RestrictionIndex.
+        """
+        return cls(_unique(*other))
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._restriction
+
+    def __getitem__(self, name: str) -> PackageSpecifier:
+        return self._restriction[name].copy()
+
+    def __len__(self) -> int:
+        return len(self._restriction)
+
+    def _restrict(self, dep: PackageSpecifier) -> PackageSpecifier:
+        # the merge can return (and modify) either operand: never pass the index's own specifier
+        restriction = self._restriction.get(dep.name)
+        if restriction is None:
+            return dep
+        return dep + restriction.copy()
+
+    def restrict(self, source: list[str]) -> list[PackageSpecifier]:
+        """
+        Restrict dependencies, see :py:func:`restrict`.
+
+        :param source: List of dependencies.
+        :return: List of dependencies.
+        """
+        return [self._restrict(PackageSpecifier(i)) for i in source]
+
+    def differences(self, source: list[str]) -> list[str]:
+        """
+        Dependencies in ``source`` that change when restricted.
+
+        :param source: List of dependencies.
+        :return: List of restricted dependencies (text) that differ from ``source``.
+        """
+        ret = []
+
+        for dep in map(PackageSpecifier, source):
+            if dep.name in self._restriction:
+                restricted = self._restrict(dep.copy())
+                if restricted != dep:
+                    ret.append(str(restricted))
+
+        return ret
+
+
+def restrict(source, other: list[str] = None) -> list[PackageSpecifier]:
+    """
+    Restrict all dependencies in ``source`` to the most restrictive version specification in
+    ``source`` and ``other``. All dependencies that are in ``other`` but not in ``source`` are
+    ignored. In instead you want to integrate them, use :py:func:`unique`::
+
+        merged = unique(*source, *other)
+
+    To restrict many sources against the same ``other``, use :py:class:`RestrictionIndex`.
+
+    :param source: List of dependencies.
+    :param other: List of other dependencies (or a :py:class:`RestrictionIndex`).
+    :return: List of dependencies.
+    """
+    if not isinstance(other, RestrictionIndex):
+        other = RestrictionIndex.from_specs(other)
+
+    return other.restrict(source)
+
+
+Unmet = namedtuple("Unmet", ["requirement", "installed"])
+
+
+class InstalledIndex:
+    """
+    Installed packages, to check many requirements against (see :py:func:`contains`)::
+
+        index = InstalledIndex.from_file("installed.txt")  # conda list --export > installed.txt
+        index.check(["foo >1.0", "bar"])
+        index.check_many([["foo >1.0"], ["bar <2.0"]], report=True)
+
+    Results are memoized per requirement (text).
+
+    :param installed: List of 'installed' dependencies, e.g. ``["foo=2.0=generic", ...]``.
+    """
+
+    def __init__(self, installed: list[str]):
+        self._installed = {i.name: i for i in map(PackageSpecifier, installed)}
+        self._memo = {}
+
+    @classmethod
+    def from_file(cls, filename: str):
+        """
+        Read the output of ``conda list --export`` (comments and empty lines are ignored).
+
+        :param filename: Filename.
+        :return: InstalledIndex.
+        """
+        with open(filename) as file:
+            lines = [line.strip() for line in file]
+
+        return cls([line for line in lines if len(line) > 0 and line[0] not in "#@"])
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._installed
+
+    def __getitem__(self, name: str) -> PackageSpecifier:
+        return self._installed[name].copy()
+
+    def __len__(self) -> int:
+        return len(self._installed)
+
+    def _unmet(self, requirement) -> Unmet:
+        """
+        ``None`` if the requirement is satisfied, the diagnostic otherwise.
+        """
+        if isinstance(requirement, str) and requirement in self._memo:
+            return self._memo[requirement]
+
+        req = PackageSpecifier(requirement)
+        installed = self._installed.get(req.name)
+
+        if installed is None:
+            ret = Unmet(str(req), None)
+        elif installed not in req:
+            ret = Unmet(str(req), str(installed))
+        else:
+            ret = None
+
+        if isinstance(requirement, str):
+            self._memo[requirement] = ret
+
+        return ret
+
+    def check(self, requirements: list[str], report: bool = False):
+        """
+        Check if all requirements are satisfied.
+
+        :param requirements: List of requirements.
+        :param report:
+            Return the list of unmet requirements as ``[(requirement, installed), ...]``
+            (``installed`` is ``None`` if the package is not installed).
+            By default, stop at the first unmet requirement and return ``False``.
+        :return: ``True`` if all requirements are satisfied, ``False`` otherwise, or the report.
+        """
+        if report:
+            return [i for i in map(self._unmet, requirements) if i is not None]
+
+        for req in requirements:
+            if self._unmet(req) is not None:
+                return False
+
+        return True
+
+    def check_many(self, requirement_sets: list[list[str]], report: bool = False) -> list:
+        """
+        Check many sets of requirements, see :py:func:`InstalledIndex.check`.
+
+        :param requirement_sets: List of lists of requirements.
+        :param report: Return the unmet requirements of each set.
+        :return: List with the result of each set.
+        """
+        return [self.check(requirements, report) for requirements in requirement_sets]
+
+
+def contains(requirements: list[PackageSpecifier], installed: list[PackageSpecifier]) -> bool:
+    """
+    Check if all dependencies in ``requirements`` are satisfied by ``installed``.
+    To check many requirements against the same ``installed``, use :py:class:`InstalledIndex`.
+
+    :param requirements: List of requirements.
+    :param installed: List of 'installed' dependencies (or an :py:class:`InstalledIndex`).
+    :return: True if all requirements are satisfied, False otherwise.
+    """
+
+    if not isinstance(installed, InstalledIndex):
+        installed = InstalledIndex(installed)
+
+    return installed.check(requirements)
+
+
+class _IntervalTree:
+    """
+    Centered interval tree to find the intervals that contain a point in
+    ``O(log n + k)`` (``n`` intervals, ``k`` results).
+
+    :param intervals: List of ``(lower, upper, value)``.
+    """
+
+    __slots__ = ("center", "by_lower", "by_upper", "left", "right")
+
+    def __init__(self, intervals: list[tuple]):
+        ends = sorted(itertools.chain.from_iterable((i[0], i[1]) for i in intervals))
+        self.center = ends[len(ends) // 2]
+        here = [i for i in intervals if i[0] <= self.center <= i[1]]
+        left = [i for i in intervals if i[1] < self.center]
+        right = [i for i in intervals if i[0] > self.center]
+        self.by_lower = sorted(here, key=lambda i: i[0])
+        self.by_upper = sorted(here, key=lambda i: i[1], reverse=True)
+        self.left = _IntervalTree(left) if left else None
+        self.right = _IntervalTree(right) if right else None
+
+    def stab(self, point) -> list:
+        """
+        Values of the intervals that contain a point.
+        """
+        ret = []
+        node = self
+
+        while node is not None:
+            if point < node.center:
+                for lower, _, value in node.by_lower:
+                    if lower > point:
+                        break
+                    ret.append(value)
+                node = node.left
+            elif point > node.center:
+                for _, upper, value in node.by_upper:
+                    if upper < point:
+                        break
+                    ret.append(value)
+                node = node.right
+            else:
+                ret += [value for _, _, value in node.by_lower]
+                break
+
+        return ret
+
+
+class VersionIndex:
+    """
+    Index of the version ranges that sources (e.g. environment files) specify per package,
+    to find which sources accept a version, or conflict with a range::
+
+        index = VersionIndex.from_files("a.yml", "b.yml", ...)
+        index.accepts("numpy", "1.26.0")  # ["a.yml", ...]
+        index.conflicts("numpy", ">=2.0")  # ["b.yml", ...]
+
+    Sources with the same range share one interval.
+    Per package, the intervals are kept in an interval tree (for :py:func:`VersionIndex.accepts`)
+    and in arrays sorted by lower and upper bound (for :py:func:`VersionIndex.conflicts`).
+    Queries cost ``O(log n + k)`` for ``n`` distinct ranges and ``k`` matching ranges.
+    """
+
+    def __init__(self):
+        self._sources = {}  # source -> ordinal
+        self._source_list = []  # ordinal -> source
+        self._intervals = defaultdict(dict)  # name -> {(lower, upper): [ordinal, ...]}
+        self._tables = {}  # name -> (tree, lowers, by_lower, uppers, by_upper)
+
+    @classmethod
+    def from_files(cls, *filenames: list[str], workers: int = None):
+        """
+        Build the index from files, see :py:func:`parse_file`.
+
+        :param filenames: List of filenames (each is a source).
+        :param workers: Number of processes over which to distribute the parsing.
+        :return: VersionIndex.
+        """
+        ret = cls()
+        filenames = list(map(str, filenames))
+
+        for filename, env in zip(filenames, _map(parse_file, filenames, workers)):
+            ret.add(filename, env["dependencies"])
+
+        return ret
+
+    def add(self, source, specs: list[str]):
+        """
+        Add the dependencies of a source.
+        Dependencies with the same name are merged (see :py:func:`unique`).
+
+        :param source: Identifier of the source (e.g. a filename).
+        :param specs: List of dependencies.
+        """
+        if source in self._sources:
+            raise ValueError(f"Source '{source}' already added")
+
+        ordinal = len(self._sources)
+        self._sources[source] = ordinal
+        self._source_list.append(source)
+
+        for name, dep in _unique(*specs).items():
+            self._intervals[name].setdefault(_range_interval(dep.range), []).append(ordinal)
+            self._tables.pop(name, None)
+
+    def _table(self, name: str) -> tuple:
+        if name not in self._tables:
+            intervals = self._intervals[name]
+            by_lower = sorted(intervals, key=lambda i: i[0])
+            by_upper = sorted(intervals, key=lambda i: i[1])
+            self._tables[name] = (
+                _IntervalTree(
+                    [(lower, upper, intervals[(lower, upper)]) for lower, upper in by_lower]
+                ),
+                [i[0] for i in by_lower],
+                [intervals[i] for i in by_lower],
+                [i[1] for i in by_upper],
+                [intervals[i] for i in by_upper],
+            )
+        return self._tables[name]
+
+    def _names(self, ordinals) -> list:
+        """
+        Sources from lists of ordinals (in the order in which the sources were added).
+        """
+        return [self._source_list[i] for i in sorted(itertools.chain.from_iterable(ordinals))]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._intervals
+
+    def sources(self, name: str) -> list:
+        """
+        Sources that specify a package.
+
+        :param name: Name of the package.
+        :return: List of sources.
+        """
+        return self._names(self._intervals.get(name, {}).values())
+
+    def accepts(self, name: str, version: str) -> list:
+        """
+        Sources whose range of a package includes a version.
+
+        :param name: Name of the package.
+        :param version: Version, e.g. ``"1.26.0"``.
+        :return: List of sources.
+        """
+        if name not in self._intervals:
+            return []
+
+        return self._names(self._table(name)[0].stab((_version_key(version), 0)))
+
+    def conflicts(self, name: str, version_range) -> list:
+        """
+        Sources whose range of a package has no version in common with a range.
+
+        :param name: Name of the package.
+        :param version_range: Range, e.g. ``">=2.0"`` or a :py:class:`VersionRange`.
+        :return: List of sources.
+        """
+        if name not in self._intervals:
+            return []
+
+        if not isinstance(version_range, VersionRange):
+            version_range = PackageSpecifier(f"{name} {version_range}").range
+
+        lower, upper = _range_interval(version_range)
+        _, lowers, by_lower, uppers, by_upper = self._table(name)
+        below = by_upper[: bisect.bisect_left(uppers, lower)]
+        above = by_lower[bisect.bisect_right(lowers, upper) :]
+        return self._names(below + above)
+
+
+Difference = namedtuple("Difference", ["name", "kind", "a", "b"])
+
+
+def _diff_kind(a: PackageSpecifier, b: PackageSpecifier) -> str:
+    """
+    Kind of change from ``a`` to ``b`` (``None`` if they specify the same), see :py:func:`diff`.
+    """
+    if a.range.same(b.range):
+        return None if a.build == b.build else "changed"
+
+    if is_disjoint(a.range, b.range):
+        return "conflicting"
+
+    if b.range in a.range:
+        return "narrowed"
+
+    if a.range in b.range:
+        return "widened"
+
+    return "changed"
+
+
+def diff(a: list[PackageSpecifier], b: list[PackageSpecifier]) -> list[Difference]:
+    """
+    Differences between ``a`` and ``b`` (sorted by name, case-insensitive, as :py:func:`unique`).
+    Each difference is ``Difference(name, kind, a, b)``, with ``a`` and ``b`` the specifiers
+    (text, ``None`` if absent), and ``kind``:
+
+    *   ``"added"``: only in ``b``.
+    *   ``"removed"``: only in ``a``.
+    *   ``"narrowed"``: the range of ``b`` is a subset of the range of ``a``.
+    *   ``"widened"``: the range of ``a`` is a subset of the range of ``b``.
+    *   ``"conflicting"``: the ranges have no version in common.
+    *   ``"changed"``: otherwise (overlapping ranges, or a different build).
+
+    :param a: List of dependencies.
+    :param b: List of dependencies.
+    :return: List of differences.
+    """
+    a = {i.name: i for i in map(PackageSpecifier, a)}
+    b = {i.name: i for i in map(PackageSpecifier, b)}
+    ret = []
+
+    for name in sorted(dict.fromkeys([*a, *b]), key=lambda x: x.lower()):
+        if name not in b:
+            ret.append(Difference(name, "removed", str(a[name]), None))
+        elif name not in a:
+            ret.append(Difference(name, "added", None, str(b[name])))
+        else:
+            kind = _diff_kind(a[name], b[name])
+            if kind is not None:
+                ret.append(Difference(name, kind, str(a[name]), str(b[name])))
+
+    return ret
+
+
+Divergence = namedtuple("Divergence", ["name", "specs", "ranges", "contains"])
+
+
+def diff_matrix(
+    dependencies: list[list[PackageSpecifier]], divergent: bool = True
+) -> list[Divergence]:
+    """
+    N-way diff: compare the dependencies of many sources (e.g. files) package by package.
+    Each package is ``Divergence(name, specs, ranges, contains)`` with:
+
+    *   ``specs``: the specifier of each source (text, ``None`` if absent).
+    *   ``ranges``: the distinct specifiers (text, in order of first occurrence).
+    *   ``contains``: ``contains[i][j]`` is ``True`` if ``ranges[i]`` is in ``ranges[j]``.
+
+    Each pair of distinct ranges is compared only once, also across packages
+    (ranges are identical if their bounds are written the same, as for ``in``).
+
+    :param dependencies: List of dependencies per source.
+    :param divergent: Only report packages that are not specified identically by all sources.
+    :return: List of packages (sorted by name).
+    """
+    tables = [{i.name: i for i in map(PackageSpecifier, deps)} for deps in dependencies]
+    names = sorted(dict.fromkeys(itertools.chain(*tables)), key=lambda x: x.lower())
+    memo = {}
+    ret = []
+
+    for name in names:
+        keys = []
+        distinct = {}
+        for table in tables:
+            dep = table.get(name)
+            if dep is None:
+                keys.append(None)
+                continue
+            key = (dep.range.canonical(), dep.build)
+            distinct.setdefault(key, dep)
+            keys.append(key)
+
+        if divergent and len(distinct) == 1 and None not in keys:
+            continue
+
+        # memoised on the strings of the bounds: the same identity as ``in`` (that compares
+        # ``==`` ranges by string)
+        bounds = [_range_strings(dep.range) for dep in distinct.values()]
+        contains = []
+        for a, rng_a in zip(bounds, distinct.values()):
+            row = []
+            for b, rng_b in zip(bounds, distinct.values()):
+                pair = (a, b)
+                if pair not in memo:
+                    memo[pair] = rng_a.range in rng_b.range
+                row.append(memo[pair])
+            contains.append(tuple(row))
+
+        specs = tuple(None if key is None else str(table[name]) for key, table in zip(keys, tables))
+        ranges = tuple(str(dep) for dep in distinct.values())
+        ret.append(Divergence(name, specs, ranges, tuple(contains)))
+
+    return ret
+
+
+def print_diff(
+    a: list[PackageSpecifier], b: list[PackageSpecifier], silent: bool = False
+) -> "prettytable.PrettyTable":
+    """
+    Print differences between ``a`` and ``b``.
+    See :py:func:`diff` for the differences as records.
+
+    :param a: List of dependencies.
+    :param b: List of dependencies.
+    :param silent: Do not print the table.
+    :return: PrettyTable object.
+    """
+    import prettytable
+
+    a = {i.name: i for i in map(PackageSpecifier, a)}
+    b = {i.name: i for i in map(PackageSpecifier, b)}
+    out = prettytable.PrettyTable()
+    out.field_names = ["a", "diff", "b"]
+    out.align["a"] = "l"
+    out.align["diff"] = "c"
+    out.align["b"] = "l"
+    out.header = False
+
+    for key in a:
+        if key not in b:
+            out.add_row([str(a[key]), "->", ""])
+            continue
+        if a[key] not in b[key]:
+            out.add_row([str(a[key]), "!=", str(b[key])])
+            continue
+
+    for key in b:
+        if key not in a:
+            out.add_row(["", "<-", str(b[key])])
+
+    if not silent:
+        print(out.get_string())
+
+    return out
+
+
+# names of conda-build selectors that are ``False`` unless selected
+_selector_names = [
+    "x86",
+    "x86_64",
+    "linux",
+    "linux32",
+    "linux64",
+    "armv6l",
+    "armv7l",
+    "aarch64",
+    "ppc64le",
+    "osx",
+    "arm64",
+    "unix",
+    "win",
+    "win32",
+    "win64",
+    "py",
+    "py3k",
+    "py2k",
+    "py27",
+    "py34",
+    "py35",
+    "py36",
+    "np",
+]
+
+# ``# [expr]`` at the end of a line
+_re_selector = re.compile(r"#\s*\[([^\[\]]*)\]\s*$")
+
+
+def _selector_truth(value):
+    return None if value is None else bool(value)
+
+
+@functools.lru_cache(maxsize=1024)
+def _selector_compile(expr: str):
+    """
+    Compile a selector expression to a function ``f(context)`` that returns
+    ``True`` (keep), ``False`` (remove), or ``None`` (indeterminate).
+    Supported are names, constants, ``and``, ``or``, ``not``, and comparisons.
+    Unknown names, unsupported syntax, and ordering comparisons with booleans are indeterminate.
+
+    :param expr: Selector expression, e.g. ``"linux and not aarch64"`` or ``"py>=38"``.
+    :return: Function.
+    """
+    import ast
+    import operator
+
+    ops = {
+        ast.Eq: operator.eq,
+        ast.NotEq: operator.ne,
+        ast.Lt: operator.lt,
+        ast.LtE: operator.le,
+        ast.Gt: operator.gt,
+        ast.GtE: operator.ge,
+        ast.In: lambda a, b: a in b,
+        ast.NotIn: lambda a, b: a not in b,
+    }
+    ordering = (ast.Lt, ast.LtE, ast.Gt, ast.GtE)
+
+    def unknown(context):
+        return None
+
+    def build(node):
+        if isinstance(node, ast.Name):
+            return lambda context, name=node.id: context.get(name)
+
+        if isinstance(node, ast.Constant):
+            return lambda context, value=node.value: value
+
+        if isinstance(node, (ast.Tuple, ast.List)):
+            items = [build(i) for i in node.elts]
+            return lambda context: tuple(i(context) for i in items)
+
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not):
+            operand = build(node.operand)
+
+            def f(context):
+                value = _selector_truth(operand(context))
+                return None if value is None else not value
+
+            return f
+
+        if isinstance(node, ast.BoolOp):
+            values = [build(i) for i in node.values]
+            stop = isinstance(node.op, ast.Or)
+
+            def f(context):
+                ret = not stop
+                for value in values:
+                    value = _selector_truth(value(context))
+                    if value is stop:
+                        return stop
+                    if value is None:
+                        ret = None
+                return ret
+
+            return f
+
+        if isinstance(node, ast.Compare):
+            operands = [build(i) for i in [node.left] + node.comparators]
+            funcs = [(type(op) in ordering, ops.get(type(op))) for op in node.ops]
+            if any(func is None for _, func in funcs):
+                return unknown
+
+            def f(context):
+                values = [i(context) for i in operands]
+                ret = True
+                for (order, func), a, b in zip(funcs, values[:-1], values[1:]):
+                    if a is None or b is None:
+                        ret = None
+                        continue
+                    if order and (isinstance(a, bool) or isinstance(b, bool)):
+                        ret = None
+                        continue
+                    try:
+                        if not func(a, b):
+                            return False
+                    except TypeError:
+                        ret = None
+                return ret
+
+            return f
+
+        return unknown
+
+    try:
+        tree = ast.parse(expr.strip(), mode="eval")
+    except SyntaxError:
+        return unknown
+
+    return build(tree.body)
+
+
+def _selector_context(
+    selectors: list[str] = [], target_platform: str = "myplatform", context: dict = None
+) -> dict:
+    """
+    Context against which selectors are evaluated:
+    all names in ``_selector_names`` are ``False``, except ``selectors`` which are ``True``.
+    ``target_platform`` and ``build_platform`` are ``target_platform``.
+
+    :param selectors: Selectors to keep.
+    :param target_platform: Target platform.
+    :param context: Extra (or overwritten) variables, e.g. ``{"py": 311, "x86_64": True}``.
+    :return: Context.
+    """
+    ret = {name: False for name in _selector_names}
+    ret["target_platform"] = target_platform
+    ret["build_platform"] = target_platform
+    ret.update({name: True for name in selectors if name.isidentifier()})
+    if context is not None:
+        ret.update(context)
+    return ret
+
+
+def _locate_selectors(lines: list[str]) -> list[str]:
+    """
+    Selector of each line: ``expr`` for a line that ends with ``# [expr]``, ``None`` otherwise.
+
+    :param lines: Lines of a recipe.
+    :return: List of selectors.
+    """
+    ret = []
+
+    for line in lines:
+        expr = None
+        if "#" in line:
+            match = _re_selector.search(line)
+            if match is not None:
+                expr = match.group(1).strip()
+        ret.append(expr)
+
+    return ret
+
+
+def _selector_mask(exprs: list[str], selectors: list[str], context: dict) -> tuple[bool]:
+    """
+    Lines to keep: those without selector, or whose selector does not evaluate to ``False``,
+    or whose selector is listed verbatim in ``selectors``.
+
+    :param exprs: Selector of each line, see :py:func:`_locate_selectors`.
+    :param selectors: Selectors to keep.
+    :param context: Context, see :py:func:`_selector_context`.
+    :return: Per line: keep or not.
+    """
+    keep = set(i.strip() for i in selectors)
+    value = {None: True}
+    ret = []
+
+    for expr in exprs:
+        if expr not in value:
+            value[expr] = expr in keep or _selector_compile(expr)(context) is not False
+        ret.append(value[expr])
+
+    return tuple(ret)
+
+
+def _platform_selectors(target_platform: str) -> list[str]:
+    """
+    Selectors that are ``True`` for a platform, e.g.
+    ``"linux-64"`` -> ``["linux", "unix", "x86", "x86_64", "linux64"]``.
+
+    :param target_platform: Platform, e.g. ``"linux-64"``, ``"osx-arm64"``, ``"win-64"``.
+    :return: List of selectors.
+    """
+    system, _, arch = target_platform.partition("-")
+
+    if system not in ["linux", "osx", "win"]:
+        return []
+
+    ret = [system]
+
+    if system in ["linux", "osx"]:
+        ret += ["unix"]
+
+    if arch in ["32", "64"]:
+        ret += ["x86"]
+
+    if arch == "64":
+        ret += ["x86_64"]
+    elif arch in ["armv6l", "armv7l", "aarch64", "ppc64le", "arm64"]:
+        ret += [arch]
+
+    if system in ["linux", "win"]:
+        ret += [f"{system}32" if arch in ["32", "armv6l", "armv7l"] else f"{system}64"]
+
+    return ret
+
+
+_jinja_options = {}
+_jinja_env = None
+
+
+def _jinja_compiler(language: str) -> str:
+    """
+    ``{{ compiler("c") }}`` -> ``c-compiler``.
+    """
+    return f"{language}-compiler"
+
+
+def _jinja_pin(name: str, *args, **kwargs) -> str:
+    """
+    ``{{ pin_compatible("numpy") }}`` or ``{{ pin_subpackage("foo", exact=True) }}`` -> ``numpy``
+    or ``foo``.
+    """
+    return name
+
+
+def set_jinja_environment(cache_dir: str = None, cache_size: int = 400, **kwargs):
+    """
+    Configure the Jinja2 environment used to render conda-forge feedstocks
+    (see :py:func:`condaforge_dependencies`).
+    Templates are compiled once per distinct text, and reused for different ``target_platform``.
+
+    :param cache_dir: Store compiled templates in this directory (reused between processes/runs).
+    :param cache_size: Number of compiled templates kept in memory.
+    :param kwargs: Other options of ``jinja2.Environment``.
+    """
+    global _jinja_options
+    global _jinja_env
+
+    _jinja_options = dict(cache_dir=cache_dir, cache_size=cache_size, **kwargs)
+    _jinja_env = None
+
+
+def get_jinja_environment():
+    """
+    Return the Jinja2 environment used to render conda-forge feedstocks,
+    see :py:func:`set_jinja_environment`.
+    The template of a text is ``get_jinja_environment().get_template(text)``.
+
+    :return: ``jinja2.Environment``
+    """
+    global _jinja_env
+
+    if _jinja_env is None:
+        _jinja_env = _jinja_environment(**_jinja_options)
+
+    return _jinja_env
+
+
+def _jinja_environment(cache_dir: str = None, cache_size: int = 400, **kwargs):
+    """
+    Create a Jinja2 environment whose loader takes the text of a template as its name.
+    """
+    import jinja2
+
+    class TextLoader(jinja2.BaseLoader):
+        def get_source(self, environment, template):
+            return template, None, lambda: True
+
+    if cache_dir is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        kwargs["bytecode_cache"] = jinja2.FileSystemBytecodeCache(str(cache_dir))
+
+    env = jinja2.Environment(loader=TextLoader(), cache_size=cache_size, **kwargs)
+    env.globals["compiler"] = _jinja_compiler
+    env.globals["pin_compatible"] = _jinja_pin
+    env.globals["pin_subpackage"] = _jinja_pin
+    return env
+
+
+def _condaforge_template(text: str):
+    """
+    Compiled template of a conda-forge feedstock, see :py:func:`get_jinja_environment`.
+    """
+    import jinja2
+
+    try:
+        return get_jinja_environment().get_template(text)
+    except jinja2.TemplateSyntaxError as e:
+        e.name = None  # the name is the text of the template
+        raise
+
+
+@functools.lru_cache(maxsize=256)
+def _condaforge_variables(text: str) -> frozenset[str]:
+    """
+    Variables that a conda-forge feedstock takes from the render context.
+    """
+    import jinja2.meta
+
+    return frozenset(jinja2.meta.find_undeclared_variables(get_jinja_environment().parse(text)))
+
+
+def _condaforge_requirements(
+    text: str, name: str, selectors: list[str], target_platform: str, context: dict = None
+) -> dict[list]:
+    """
+    Render and read a conda-forge feedstock, see :py:func:`condaforge_dependencies`.
+
+    :return: ``{"host": [...], "run": [...], "build": [...]}``
+    """
+    lines = _condaforge_template(text).render(target_platform=target_platform).split("\n")
+    context = _selector_context(selectors, target_platform, context)
+    mask = _selector_mask(_locate_selectors(lines), selectors, context)
+    data = _yaml_load("\n".join(itertools.compress(lines, mask)))
+    return _condaforge_extract(data, name)
+
+
+def _condaforge_extract(data: dict, name: str) -> dict[list]:
+    """
+    Requirements of a (rendered and loaded) conda-forge feedstock.
+
+    :param data: Feedstock.
+    :param name: Name of the recipe to select (use to select one of multi-outputs).
+    :return: ``{"host": [...], "run": [...], "build": [...]}``
+    """
+    ret = {key: [] for key in ["host", "run", "build"]}
+
+    if "outputs" in data:
+        for sub in data["outputs"]:
+            if not name or sub["name"] == name:
+                for key in ["host", "run", "build"]:
+                    if key in sub["requirements"]:
+                        ret[key] = sub["requirements"][key]
+    else:
+        for key in ret:
+            if key in data["requirements"]:
+                ret[key] = data["requirements"][key]
+
+    return ret
+
+
+def condaforge_dependencies(
+    text: str,
+    name: str = None,
+    flatten: bool = True,
+    selectors: list[str] = [],
+    target_platform: str = "myplatform",
+    context: dict = None,
+) -> list[str]:
+    """
+    Get the dependencies from a conda-forge feedstock.
+
+    Lines with a selector ``# [expr]`` are removed if ``expr`` evaluates to ``False``.
+    The selectors ``x86``, ``linux``, ``osx``, ``win``, ``py``, ``np``, ... are ``False``
+    unless listed in ``selectors`` (or set in ``context``).
+    Expressions such as ``not win``, ``linux and x86_64``, or ``py>=38`` are supported.
+    Lines whose selector cannot be evaluated (e.g. ``py>=38`` if ``py`` is not set) are kept.
+
+    :param name: Name of the recipe to select (use to select one of multi-outputs).
+    :param flatten: Flatten the dependencies, otherwise keep as ``"host"``, ``"run"``, ``"build"``.
+    :param selectors:
+        List of selectors that are ``True``.
+        An expression listed verbatim (e.g. ``"build_platform != target_platform"``) is kept.
+    :param target_platform: Target platform to use to substitute ``{{ target_platform }}``.
+    :param context: Variables of selectors, e.g. ``{"py": 311, "np": 126}``.
+    """
+
+    cache = _get_disk_cache()
+
+    if cache is None:
+        ret = _condaforge_requirements(text, name, selectors, target_platform, context)
+    else:
+        variables = None if context is None else sorted(context.items())
+        key = cache.key(
+            "condaforge", text.encode(), name, sorted(selectors), target_platform, variables
+        )
+        ret = cache.get(key)
+        if ret is None:
+            ret = _condaforge_requirements(text, name, selectors, target_platform, context)
+            cache.put(key, ret)
+
+    if flatten:
+        out = []
+        for key in ret:
+            out += ret[key]
+        return unique(*out)
+
+    for key in ret:
+        ret[key] = [PackageSpecifier(i) for i in ret[key]]
+
+    return ret
+
+
+def condaforge_platforms(
+    text: str,
+    platforms: list,
+    name: str = None,
+    selectors: list[str] = [],
+    context: dict = None,
+) -> dict:
+    """
+    Get the dependencies from a conda-forge feedstock for several platforms at once::
+
+        deps = condaforge_platforms(text, ["linux-64", "osx-arm64", "win-64"])
+        deps["platforms"]["linux-64"]  # dependencies on linux-64
+        deps["intersection"]  # dependencies on all platforms
+        deps["union"]  # dependencies on any platform
+        deps["conflicts"]  # dependencies on all platforms that no version satisfies everywhere
+
+    Each platform sets ``target_platform`` and its selectors
+    (e.g. ``linux``, ``unix``, ``x86_64``, ``linux64`` for ``"linux-64"``),
+    see :py:func:`condaforge_dependencies`.
+    The recipe is rendered only once if it does not use ``target_platform``,
+    and platforms whose selected text is the same share one read.
+
+    :param text: Feedstock.
+    :param platforms:
+        List of platforms, each either a string (e.g. ``"linux-64"``) or a dictionary
+        ``{"target_platform": "linux-64", "selectors": [...], "context": {...}, "name": "..."}``
+        (all but ``"target_platform"`` optional, ``"name"`` defaults to ``"target_platform"``).
+    :param name: Name of the recipe to select (use to select one of multi-outputs).
+    :param selectors: List of selectors that are ``True`` on all platforms.
+    :param context: Variables of selectors on all platforms, e.g. ``{"py": 311}``.
+    :return:
+        ``{"platforms": {platform: [...], ...}, "intersection": [...], "union": [...],
+        "conflicts": {name: {platform: ..., ...}, ...}}``.
+        In ``"intersection"`` the most restrictive specification over all platforms is used
+        (see :py:func:`unique`). Dependencies for which that does not exist (e.g.
+        ``numpy >=2.0  # [linux]`` and ``numpy <2.0  # [win]``) are instead listed in
+        ``"conflicts"``, with their specification (text) per platform.
+        In ``"union"`` each dependency accepts any version that is accepted on one of the
+        platforms (see :py:func:`union`): a dependency is listed once for each disjoint range.
+    """
+    shared = "target_platform" not in _condaforge_variables(text)
+    rendered = {}
+    read = {}
+    ret = {}
+
+    for platform in platforms:
+        if isinstance(platform, str):
+            platform = {"target_platform": platform}
+
+        target_platform = platform["target_platform"]
+        sel = list(selectors) + _platform_selectors(target_platform)
+        sel += platform.get("selectors", [])
+        variables = dict(context or {})
+        variables.update(platform.get("context", {}))
+
+        key = None if shared else target_platform
+        if key not in rendered:
+            template = _condaforge_template(text)
+            lines = template.render(target_platform=target_platform).split("\n")
+            rendered[key] = (lines, _locate_selectors(lines))
+
+        lines, exprs = rendered[key]
+        mask = _selector_mask(exprs, sel, _selector_context(sel, target_platform, variables))
+
+        data = "\n".join(itertools.compress(lines, mask))
+        if data not in read:
+            deps = _condaforge_extract(_yaml_load(data), name)
+            read[data] = unique(*itertools.chain(*deps.values()))
+
+        ret[platform.get("name", target_platform)] = [i.copy() for i in read[data]]
+
+    tables = {platform: {i.name: i for i in deps} for platform, deps in ret.items()}
+    names = sorted(set().union(*tables.values()), key=lambda x: x.lower())
+    intersection = []
+    conflicts = {}
+    either = []
+
+    for dep in names:
+        specs = {platform: table[dep] for platform, table in tables.items() if dep in table}
+
+        if len(specs) == len(tables):
+            try:
+                intersection += unique(*[i.copy() for i in specs.values()])
+            except ValueError:
+                conflicts[dep] = {platform: str(spec) for platform, spec in specs.items()}
+
+        first = next(iter(specs.values()))
+        if all(first == spec for spec in specs.values()):
+            either.append(first.copy())
+            continue
+
+        for rng in union(*[spec.range for spec in specs.values()]):
+            spec = PackageSpecifier()
+            spec.name = dep
+            spec.range = rng
+            either.append(spec)
+
+    return {
+        "platforms": ret,
+        "intersection": intersection,
+        "union": either,
+        "conflicts": conflicts,
+    }
+
+
+def _iter_recipes(*args: list[str]):
+    """
+    Yield recipes: files as they are, directories are searched (recursively) for
+    ``meta.yaml`` and ``meta.yml``.
+
+    :param args: Files and/or directories.
+    :return: Generator of filenames.
+    """
+    for path in map(pathlib.Path, args):
+        if path.is_dir():
+            found = list(path.rglob("meta.yaml")) + list(path.rglob("meta.yml"))
+            yield from map(str, sorted(found))
+        else:
+            yield str(path)
+
+
+_scan_options = None
+
+
+def _scan_feedstock(recipe: str, options: tuple) -> dict:
+    """
+    Report of one feedstock, see :py:func:`scan_feedstocks`.
+    """
+    restriction, selectors, target_platform, context = options
+
+    try:
+        with open(recipe) as file:
+            text = file.read()
+        source = condaforge_dependencies(
+            text, selectors=selectors, target_platform=target_platform, context=context
+        )
+        return {"recipe": recipe, "differences": restriction.differences(source)}
+    except Exception as e:
+        return {"recipe": recipe, "error": f"{type(e).__name__}: {e}"}
+
+
+def _scan_feedstock_worker(recipe: str) -> dict:
+    return _scan_feedstock(recipe, _scan_options)
+
+
+def _init_scan_worker(
+    yaml_backend: str, disk_cache: _DiskCache, jinja_options: dict, options: tuple
+):
+    """
+    Initialise a worker process of :py:func:`scan_feedstocks`.
+    """
+    global _scan_options
+    _init_worker(yaml_backend, disk_cache, jinja_options)
+    _scan_options = options
+
+
+def scan_feedstocks(
+    recipes: list[str],
+    environment: list[str],
+    workers: int = None,
+    selectors: list[str] = [],
+    target_platform: str = "myplatform",
+    context: dict = None,
+):
+    """
+    Check many conda-forge feedstocks against an environment.
+    For each recipe yield (in order)::
+
+        {"recipe": "path/to/meta.yaml", "differences": ["foo >=1.2,<2", ...]}
 
-    return deps
+    with the dependencies of the recipe that are restricted by ``environment``
+    (see :py:func:`restrict`), or::
 
+        {"recipe": "path/to/meta.yaml", "error": "ValueError: ..."}
 
-def unique(*args) -> list[PackageSpecifier]:
-    """
-    Return a list of 'unique' dependencies. If multiple dependencies with the same name are given,
-    the most restrictive version specification is returned.
+    if the recipe could not be read.
 
-    :param args: Dependencies to merge.
-    :return: List of unique dependencies (convert to strings: ``list(map(str, unique(*args)))``)
+    :param recipes: Files and/or directories (searched recursively for ``meta.yaml``).
+    :param environment: List of dependencies (e.g. ``parse_file(...)["dependencies"]``).
+    :param workers: Number of processes.
+    :param selectors: See :py:func:`condaforge_dependencies`.
+    :param target_platform: See :py:func:`condaforge_dependencies`.
+    :param context: See :py:func:`condaforge_dependencies`.
+    :return: Generator of reports.
     """
-    deps = _unique(*args)
-    return [deps[key] for key in sorted(deps, key=lambda x: x.lower())]
+    options = (RestrictionIndex.from_specs(environment), selectors, target_platform, context)
+    recipes = _iter_recipes(*recipes)
 
+    if workers is None or workers <= 1:
+        for recipe in recipes:
+            yield _scan_feedstock(recipe, options)
+        return
 
-def restrict(source, other: list[str] = None) -> list[PackageSpecifier]:
-    """
-    Restrict all dependencies in ``source`` to the most restrictive version specification in
-    ``source`` and ``other``. All dependencies that are in ``other`` but not in ``source`` are
-    ignored. In instead you want to integrate them, use :py:func:`unique`::
+    import concurrent.futures
 
-        merged = unique(*source, *other)
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_scan_worker,
+        initargs=(get_yaml_backend(), _get_disk_cache(), _jinja_options, options),
+    ) as pool:
+        yield from pool.map(_scan_feedstock_worker, recipes, chunksize=32)
 
-    :param source: List of dependencies.
-    :param other: List of other dependencies.
-    :return: List of dependencies.
+
+def _yaml_event_object(loader, anchors: dict):
+    """
+    Construct the Python object of the next node from the YAML event stream.
+
+    :param loader: YAML loader (used as event parser, resolver, and scalar constructor).
+    :param anchors: Objects of anchors encountered so far.
+    :return: The constructed object.
     """
+    import yaml
 
-    restriction = defaultdict(PackageSpecifier)
+    event = loader.get_event()
 
-    for dep in unique(*other):
-        restriction[dep.name] += dep
+    if isinstance(event, yaml.AliasEvent):
+        return anchors[event.anchor]
 
-    ret = [PackageSpecifier(i) for i in source]
+    if isinstance(event, yaml.ScalarEvent):
+        tag = event.tag
+        if tag is None or tag == "!":
+            tag = loader.resolve(yaml.ScalarNode, event.value, event.implicit)
+        constructor = loader.yaml_constructors.get(tag)
+        if constructor is None:
+            ret = event.value
+        else:
+            ret = constructor(loader, yaml.ScalarNode(tag, event.value, style=event.style))
+    elif isinstance(event, yaml.SequenceStartEvent):
+        ret = []
+        while not loader.check_event(yaml.SequenceEndEvent):
+            ret.append(_yaml_event_object(loader, anchors))
+        loader.get_event()
+    elif isinstance(event, yaml.MappingStartEvent):
+        ret = {}
+        while not loader.check_event(yaml.MappingEndEvent):
+            key = _yaml_event_object(loader, anchors)
+            ret[key] = _yaml_event_object(loader, anchors)
+        loader.get_event()
+    else:
+        raise ValueError(f"Unexpected YAML event {event}")
 
-    for i, dep in enumerate(ret):
-        if dep.name in restriction:
-            ret[i] += restriction[dep.name]
+    if event.anchor is not None:
+        anchors[event.anchor] = ret
 
     return ret
 
 
-def contains(requirements: list[PackageSpecifier], installed: list[PackageSpecifier]) -> bool:
+def _iter_yaml_mapping(stream, keys: list[str], name: str):
     """
-    Check if all dependencies in ``requirements`` are satisfied by ``installed``.
-
-    :param requirements: List of requirements.
-    :param installed: List of 'installed' dependencies.
-    :return: True if all requirements are satisfied, False otherwise.
+    Stream the top-level mapping of a YAML document without loading the document as a whole.
+    For each key, yield ``(key, value)`` if the value is a string, or ``(key, item)`` for each
+    item if the value is a list. Other values are ignored.
+
+    :param stream: Text, bytes, or file object.
+    :param keys: Allowed keys.
+    :param name: Name of the stream (for error messages).
+    :return: Generator of ``(key, value)``.
     """
+    import yaml
 
-    installed = {i.name: i for i in map(PackageSpecifier, installed)}
+    loader = _yaml_loader()(stream)
+    anchors = {}
 
-    for req in map(PackageSpecifier, requirements):
-        if req.name not in installed:
-            return False
-        if installed[req.name] not in req:
-            return False
+    try:
+        loader.get_event()  # stream start
 
-    return True
+        if loader.check_event(yaml.StreamEndEvent):
+            return
 
+        loader.get_event()  # document start
 
-def print_diff(
-    a: list[PackageSpecifier], b: list[PackageSpecifier], silent: bool = False
-) -> prettytable.PrettyTable:
-    """
-    Print differences between ``a`` and ``b``.
+        if not loader.check_event(yaml.MappingStartEvent):
+            raise ValueError("Expected a mapping at the top-level")
 
-    :param a: List of dependencies.
-    :param b: List of dependencies.
-    :param silent: Do not print the table.
-    :return: PrettyTable object.
+        loader.get_event()
+
+        while not loader.check_event(yaml.MappingEndEvent):
+            key = _yaml_event_object(loader, anchors)
+
+            if key not in keys:
+                raise ValueError(f"Unknown key '{key}' in '{name}'.")
+
+            if loader.check_event(yaml.SequenceStartEvent):
+                event = loader.get_event()
+                items = []
+                while not loader.check_event(yaml.SequenceEndEvent):
+                    item = _yaml_event_object(loader, anchors)
+                    if event.anchor is not None:
+                        items.append(item)
+                    yield key, item
+                loader.get_event()
+                if event.anchor is not None:
+                    anchors[event.anchor] = items
+            else:
+                value = _yaml_event_object(loader, anchors)
+                if isinstance(value, str):
+                    yield key, value
+    finally:
+        loader.dispose()
+
+
+def _iter_file_entries(filename: str):
     """
+    Yield the raw ``(key, value)`` entries of an environment file, see :py:func:`iter_parse_files`.
+    The entries are read from, or stored in, the on-disk cache (if enabled).
+    """
+    keys = ["name", "channels", "dependencies"]
+    cache = _get_disk_cache()
 
-    a = {i.name: i for i in map(PackageSpecifier, a)}
-    b = {i.name: i for i in map(PackageSpecifier, b)}
-    out = prettytable.PrettyTable()
-    out.field_names = ["a", "diff", "b"]
-    out.align["a"] = "l"
-    out.align["diff"] = "c"
-    out.align["b"] = "l"
-    out.header = False
+    if cache is None:
+        with open(filename) as file:
+            yield from _iter_yaml_mapping(file, keys, filename)
+        return
 
-    for key in a:
-        if key not in b:
-            out.add_row([str(a[key]), "->", ""])
-            continue
-        if a[key] not in b[key]:
-            out.add_row([str(a[key]), "!=", str(b[key])])
-            continue
+    with open(filename, "rb") as file:
+        content = file.read()
 
-    for key in b:
-        if key not in a:
-            out.add_row(["", "<-", str(b[key])])
+    key = cache.key("environment", content)
+    entries = cache.get(key)
 
-    if not silent:
-        print(out.get_string())
+    if entries is None:
+        entries = list(_iter_yaml_mapping(content, keys, filename))
+        cache.put(key, entries)
 
-    return out
+    yield from entries
 
 
-def condaforge_dependencies(
-    text: str,
-    name: str = None,
-    flatten: bool = True,
-    selectors: list[str] = [],
-    target_platform: str = "myplatform",
-) -> list[str]:
+def iter_parse_files(*args: list[str]):
     """
-    Get the dependencies from a conda-forge feedstock.
+    Parse one or more files, and yield the entries one-by-one.
+    Files are read as a stream: memory does not scale with the size or the number of files
+    (unless the on-disk cache is used, see :py:func:`enable_disk_cache`,
+    in which case files are read one at a time).
 
-    :param name: Name of the recipe to select (use to select one of multi-outputs).
-    :param flatten: Flatten the dependencies, otherwise keep as ``"host"``, ``"run"``, ``"build"``.
-    :param selectors: List of selectors to keep (all non-selected selectors are removed).
-    :param target_platform: Target platform to use to substitute ``{{ target_platform }}``.
+    :param args: List of filenames to parse.
+    :return: Generator of ``(filename, key, value)``, with ``key`` one of
+        ``"name"``, ``"channels"``, ``"dependencies"``.
+        For ``"dependencies"``, ``value`` is a :py:class:`PackageSpecifier`.
     """
 
-    data = text.replace("{{ compiler('c') }}", "c-compiler")
-    data = data.replace("{{ compiler('cxx') }}", "cxx-compiler")
-    data = data.replace('{{ compiler("c") }}', "c-compiler")
-    data = data.replace('{{ compiler("cxx") }}', "cxx-compiler")
-    rtemplate = Environment(loader=BaseLoader).from_string(data)
-    data = rtemplate.render(target_platform=target_platform)
-
-    data = data.split("\n")
-
-    rm_selectors = [
-        "x86",
-        "x86_64",
-        "linux",
-        "linux32",
-        "linux64",
-        "armv6l",
-        "armv7l",
-        "aarch64",
-        "ppc64le",
-        "osx",
-        "arm64",
-        "unix",
-        "win",
-        "win32",
-        "win64",
-        "py",
-        "py3k",
-        "py2k",
-        "py27",
-        "py34",
-        "py35",
-        "py36",
-        "np",
-        "build_platform",
-        "build_platform != target_platform",
-    ]
-
-    for selector in selectors:
-        rm_selectors.remove(selector)
-
-    for selector in rm_selectors:
-        data = [i for i in data if not re.match(rf"(.*)(# \[{selector}\])(.*)", i)]
-
-    data = yaml.load("\n".join(data), Loader=yaml.FullLoader)
-
-    ret = {key: [] for key in ["host", "run", "build"]}
-
-    if "outputs" in data:
-        for sub in data["outputs"]:
-            if not name or sub["name"] == name:
-                for key in ["host", "run", "build"]:
-                    if key in sub["requirements"]:
-                        ret[key] = sub["requirements"][key]
-    else:
-        for key in ret:
-            if key in data["requirements"]:
-                ret[key] = data["requirements"][key]
+    for filename in args:
+        if not os.path.isfile(filename):
+            raise FileNotFoundError(filename)
 
-    if flatten:
-        out = []
-        for key in ret:
-            out += ret[key]
-        return unique(*out)
+        for key, value in _iter_file_entries(filename):
+            if key == "dependencies":
+                value = PackageSpecifier(value)
+            yield filename, key, value
 
-    for key in ret:
-        ret[key] = [PackageSpecifier(i) for i in ret[key]]
 
-    return ret
+def _parse_file_records(filename: str) -> list[tuple]:
+    """
+    Entries of one file: ``[(key, value), ...]``, see :py:func:`iter_parse_files`.
+    """
+    return [(key, value) for _, key, value in iter_parse_files(filename)]
 
 
-def parse_file(*args: list[str]) -> dict:
+def parse_file(*args: list[str], workers: int = None) -> dict:
     """
     Parse one or more files and return the raw result.
+    See :py:func:`iter_parse_files` to iterate over the entries instead.
 
     :param args: List of filenames to parse.
+    :param workers:
+        Number of processes over which to distribute the files.
+        The result does not depend on the number of processes.
     :return: Raw result: ``{"name": [...], "channels": [...], "dependencies": [...]}``
     """
 
     env = {"name": [], "channels": [], "dependencies": []}
 
-    for filename in args:
-        if not os.path.isfile(filename):
-            raise FileNotFoundError(filename)
-
-        with open(filename) as file:
-            data = yaml.load(file.read(), Loader=yaml.FullLoader)
+    if workers is None or workers <= 1:
+        records = ((key, value) for _, key, value in iter_parse_files(*args))
+    else:
+        records = itertools.chain.from_iterable(_map(_parse_file_records, args, workers))
 
-            for key, value in data.items():
-                if key not in env:
-                    raise ValueError(f"Unknown key '{key}' in '{filename}'.")
-                if isinstance(value, str):
-                    env[key].append(value)
-                elif isinstance(value, list):
-                    env[key] += value
+    for key, value in records:
+        env[key].append(value)
 
     for key in ["channels", "name"]:
         if "channels" in env:
@@ -1038,11 +3321,249 @@ def parse_file(*args: list[str]) -> dict:
     if len(env["channels"]) == 0:
         del env["channels"]
 
-    env["dependencies"] = [PackageSpecifier(i) for i in env["dependencies"]]
-
     return env
 
 
+def _stat(filename: str) -> tuple:
+    """
+    Signature of a file to detect changes: ``(mtime, size)`` or ``None`` if it does not exist.
+    """
+    try:
+        stat = os.stat(filename)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def _write_atomic(filename: str, text: str):
+    """
+    Write a file atomically (readers never see a partially written file).
+    The file keeps its permissions (new files get the default permissions, respecting the umask).
+    If the file is a symbolic link, its target is written (the link is kept).
+    """
+    import tempfile
+
+    filename = os.path.realpath(filename)
+    dirname = os.path.dirname(filename)
+
+    try:
+        mode = os.stat(filename).st_mode & 0o7777
+    except FileNotFoundError:
+        umask = os.umask(0)
+        os.umask(umask)
+        mode = 0o666 & ~umask
+
+    with tempfile.NamedTemporaryFile("w", dir=dirname, prefix=".", delete=False) as file:
+        file.write(text)
+
+    try:
+        os.chmod(file.name, mode)
+        os.replace(file.name, filename)
+    except BaseException:
+        os.remove(file.name)
+        raise
+
+
+class IncrementalMerger:
+    """
+    Merge files (see :py:func:`parse_file` and :py:func:`unique`) and keep the merge up-to-date
+    when files change::
+
+        merger = IncrementalMerger(["a.yml", "b.yml"])
+        env = merger.env()
+        ...
+        merger.poll()  # re-parse changed files
+        env = merger.env()
+
+    Each file's contribution is kept in memory.
+    On a change, only the changed file is re-parsed, and only the names of the dependencies
+    in its old or new contribution are merged again.
+    The result is the same as merging all files from scratch.
+
+    :param files: List of filenames.
+    :param append: Dependencies merged after those of the files.
+    :param remove: Names of dependencies to remove from the output, see :py:func:`remove`.
+    :param workers: Number of processes used for the initial parse.
+    """
+
+    def __init__(
+        self,
+        files: list[str],
+        append: list[str] = None,
+        remove: list[str] = None,
+        workers: int = None,
+    ):
+        self.files = list(map(str, files))
+        self.append = [PackageSpecifier(i) for i in append or []]
+        self.remove = list(remove or [])
+        self._removed = set(map(_specifier_name, self.remove))
+        self._records = {}
+        self._stats = {}
+        self._merged = {}
+
+        for filename, records in zip(self.files, _map(_parse_file_records, self.files, workers)):
+            self._stats[filename] = _stat(filename)
+            self._records[filename] = self._contribution(records)
+
+        names = set()
+        for records in self._records.values():
+            names.update(records["dependencies"])
+        names.update(i.name for i in self.append)
+        self._apply(self._merge(names))
+
+    @staticmethod
+    def _contribution(records: list[tuple]) -> dict:
+        """
+        Contribution of a file: ``{"name": [...], "channels": [...], "dependencies": {...}}``,
+        with ``"dependencies"`` a list of dependencies per name.
+        """
+        ret = {"name": [], "channels": [], "dependencies": defaultdict(list)}
+
+        for key, value in records:
+            if key == "dependencies":
+                ret[key][value.name].append(value)
+            else:
+                ret[key].append(value)
+
+        ret["dependencies"] = dict(ret["dependencies"])
+        return ret
+
+    def _merge(self, names: set[str], override: dict = None) -> dict:
+        """
+        Merge the dependencies with these names (in the order of the files),
+        without modifying the merger.
+
+        :param names: Names of dependencies.
+        :param override: Contribution to use instead of the current one: ``{filename: ...}``.
+        :return: ``{name: dependency}`` (``None`` if no file or appended dependency has it).
+        """
+        override = override or {}
+        ret = {}
+
+        for name in names:
+            dep = PackageSpecifier()
+            for filename in self.files:
+                records = override.get(filename, self._records[filename])
+                for item in records["dependencies"].get(name, []):
+                    dep += item.copy()
+            for item in self.append:
+                if item.name == name:
+                    dep += item.copy()
+            ret[name] = None if dep.name is None else dep
+
+        return ret
+
+    def _apply(self, merged: dict):
+        """
+        Store the result of :py:func:`IncrementalMerger._merge`.
+        """
+        for name, dep in merged.items():
+            if dep is None:
+                self._merged.pop(name, None)
+            else:
+                self._merged[name] = dep
+
+    def update(self, filename: str) -> set[str]:
+        """
+        Re-parse a file and update the merge.
+        If the file cannot be parsed or merged (e.g. on a version clash) an error is raised,
+        and the merger is left unchanged.
+
+        :param filename: One of the files.
+        :return: Names of the dependencies that were merged again.
+        """
+        filename = str(filename)
+        stat = _stat(filename)
+        records = self._contribution(_parse_file_records(filename))
+        old = self._records[filename]["dependencies"]
+        names = set(old) | set(records["dependencies"])
+        merged = self._merge(names, {filename: records})
+        self._records[filename] = records
+        self._stats[filename] = stat
+        self._apply(merged)
+        return names
+
+    def poll(self) -> set[str]:
+        """
+        Re-parse all files that changed (modification time or size) since they were last parsed.
+        If a file cannot be parsed (e.g. because it is being written) or merged
+        (e.g. on a version clash), its previous contribution is kept, a warning is issued,
+        and it is tried again on the next change.
+
+        :return: Names of the dependencies that were merged again.
+        """
+        ret = set()
+
+        for filename in self.files:
+            stat = _stat(filename)
+            if stat == self._stats[filename]:
+                continue
+            try:
+                ret |= self.update(filename)
+            except Exception as e:
+                self._stats[filename] = stat
+                warnings.warn(f'Cannot parse "{filename}": {e}')
+
+        return ret
+
+    def watch(self, callback, interval: float = 1.0, count: int = None):
+        """
+        Poll for changes (see :py:func:`IncrementalMerger.poll`) and call ``callback(self)``
+        after every change.
+        If the callback raises (e.g. because the merged environment is invalid),
+        a warning is issued and polling continues.
+
+        :param callback: Function.
+        :param interval: Time between polls in seconds.
+        :param count: Number of polls (default: infinite).
+        """
+        import time
+
+        for _ in itertools.count() if count is None else range(count):
+            time.sleep(interval)
+            if len(self.poll()) > 0:
+                try:
+                    callback(self)
+                except Exception as e:
+                    warnings.warn(f"Callback failed: {e}")
+
+    def dependencies(self) -> list[PackageSpecifier]:
+        """
+        Merged dependencies, see :py:func:`unique`.
+
+        :return: List of dependencies.
+        """
+        keys = sorted(self._merged, key=lambda x: x.lower())
+        return [self._merged[key].copy() for key in keys if key not in self._removed]
+
+    def env(self) -> dict:
+        """
+        Merged environment: ``{"name": ..., "channels": [...], "dependencies": [...]}``
+        (``"name"`` and ``"channels"`` only if any file specifies them).
+
+        :return: Environment.
+        """
+        env = {"name": [], "channels": []}
+
+        for filename in self.files:
+            env["name"] += self._records[filename]["name"]
+            env["channels"] += self._records[filename]["channels"]
+
+        if len(env["name"]) > 1:
+            raise ValueError("Multiple 'name' keys.")
+        if len(env["name"]) == 1:
+            env["name"] = env["name"][0]
+        else:
+            del env["name"]
+
+        env["channels"] = list(set(env["channels"]))
+        if len(env["channels"]) == 0:
+            del env["channels"]
+
+        env["dependencies"] = self.dependencies()
+        return env
+
+
 def _iterate_nested_dict(mydict: dict):
     for key, value in mydict.items():
         yield key, value
@@ -1085,7 +3606,14 @@ def filter_selectors(deps: list[str]) -> list[str]:
     :param deps: List of dependencies (text).
     :return: List of dependencies (text) without selectors, and dependencies excluded by selectors.
     """
-    return [apply_selector(i) for i in deps if apply_selector(i)]
+    ret = []
+
+    for dep in deps:
+        dep = apply_selector(dep)
+        if dep:
+            ret.append(dep)
+
+    return ret
 
 
 def parse_github_action(text: str) -> dict:
@@ -1110,7 +3638,7 @@ def parse_github_action(text: str) -> dict:
             if re.match(r"(\s*)(-\s)(.*)", line):
                 break
             select += [line]
-        data = yaml.load("\n".join(select), Loader=yaml.FullLoader)
+        data = _yaml_load("\n".join(select))
 
         for key in data:
             if isinstance(data[key], str):
@@ -1154,10 +3682,13 @@ def _conda_envfile_parse_parser():
     """
     parser = argparse.ArgumentParser(formatter_class=_MyFmt, description=textwrap.dedent(desc))
     parser.add_argument("--version", action="version", version=version)
+    parser.add_argument("-j", "--jobs", type=int, default=1, help="Number of processes.")
     parser.add_argument("files", type=str, nargs="*", help="Input files.")
+    _add_cache_arguments(parser)
     return parser
 
 
+@_scoped_cache_arguments
 def conda_envfile_parse(args: list[str]):
     """
     Command-line tool, see ``--help``.
@@ -1167,12 +3698,12 @@ def conda_envfile_parse(args: list[str]):
 
     parser = _conda_envfile_parse_parser()
     args = parser.parse_args(args)
+    _apply_cache_arguments(args)
 
-    for filename in args.files:
-        env = parse_file(filename)
+    for filename, env in zip(args.files, _map(parse_file, args.files, args.jobs)):
         env["dependencies"] = list(map(str, unique(*env["dependencies"])))
         with open(filename, "w") as file:
-            yaml.dump(env, file, sort_keys=False)
+            _yaml_dump(env, file, sort_keys=False)
 
 
 def _conda_envfile_parse_cli():
@@ -1196,6 +3727,10 @@ def _conda_envfile_merge_parser():
         dependencies:
         - ...
         - ...
+
+    To keep the output up-to-date while editing the files, use::
+
+        conda_envfile_merge --watch -o merged.yml a.yml b.yml ...
     """
     parser = argparse.ArgumentParser(formatter_class=_MyFmt, description=textwrap.dedent(desc))
     parser.add_argument("--version", action="version", version=version)
@@ -1204,6 +3739,11 @@ def _conda_envfile_merge_parser():
     parser.add_argument("-a", "--append", type=str, action="append", default=[], help="Append deps")
     parser.add_argument("-r", "--remove", type=str, action="append", default=[], help="Remove deps")
     parser.add_argument("--no-name", action="store_true", help="Remove name from output.")
+    parser.add_argument("-j", "--jobs", type=int, default=1, help="Number of processes.")
+    parser.add_argument(
+        "--watch", action="store_true", help="Update output when any of the files changes."
+    )
+    parser.add_argument("--interval", type=float, default=1.0, help="Seconds between checks.")
     parser.add_argument(
         "--github-action",
         type=str,
@@ -1212,9 +3752,23 @@ def _conda_envfile_merge_parser():
         help="Interpret file as GitHub action",
     )
     parser.add_argument("files", type=str, nargs="*", help="Input file(s).")
+    _add_cache_arguments(parser)
     return parser
 
 
+def _extend_env(env: dict, extra: dict):
+    """
+    Add ``extra`` to ``env`` (in-place): lists are concatenated,
+    other values (e.g. ``"name"``) are only added if ``env`` does not have them.
+    """
+    for key, value in extra.items():
+        if key not in env:
+            env[key] = list(value) if isinstance(value, list) else value
+        elif isinstance(env[key], list) and isinstance(value, list):
+            env[key] = env[key] + value
+
+
+@_scoped_cache_arguments
 def conda_envfile_merge(args: list[str]):
     """
     Command-line tool, see ``--help``.
@@ -1224,41 +3778,51 @@ def conda_envfile_merge(args: list[str]):
 
     parser = _conda_envfile_merge_parser()
     args = parser.parse_args(args)
-    env = parse_file(*args.files)
+    _apply_cache_arguments(args)
 
-    if args.github_action:
-        for filename in args.github_action:
-            with open(filename) as file:
-                extra = parse_github_action(file.read())
-                for key in extra:
-                    if key not in env:
-                        env[key] = extra[key]
-                    else:
-                        env[key] += extra[key]
+    if args.watch and not args.output:
+        parser.error("--watch requires --output")
+
+    extra = {}
+    for filename in args.github_action:
+        with open(filename) as file:
+            _extend_env(extra, parse_github_action(file.read()))
 
-    env["dependencies"] = unique(*(env["dependencies"] + filter_selectors(args.append)))
+    merger = IncrementalMerger(
+        args.files,
+        append=extra.pop("dependencies", []) + filter_selectors(args.append),
+        remove=filter_selectors(args.remove),
+        workers=args.jobs,
+    )
 
-    if args.remove:
-        env["dependencies"] = remove(env["dependencies"], *filter_selectors(args.remove))
+    def render(merger):
+        env = merger.env()
+        _extend_env(env, extra)
 
-    env["dependencies"] = list(map(str, env["dependencies"]))
+        env["dependencies"] = list(map(str, env["dependencies"]))
 
-    for key in env:
-        if key == "dependencies":
-            continue
-        if isinstance(env[key], list):
-            env[key] = list(set(env[key]))
+        for key in env:
+            if key == "dependencies":
+                continue
+            if isinstance(env[key], list):
+                env[key] = list(set(env[key]))
+
+        if args.no_name:
+            env.pop("name", None)
 
-    if args.no_name:
-        env.pop("name", None)
+        return env
+
+    env = render(merger)
 
     if not args.output:
-        print(yaml.dump(env, default_flow_style=False, default_style="").strip())
+        print(_yaml_dump(env, default_flow_style=False, default_style="").strip())
         return 0
 
     dirname = os.path.dirname(args.output)
 
     if not args.force:
+        import click
+
         if os.path.isfile(args.output):
             if not click.confirm(f'Overwrite "{args.output:s}"?'):
                 raise OSError("Cancelled")
@@ -1269,8 +3833,16 @@ def conda_envfile_merge(args: list[str]):
     if not os.path.isdir(dirname) and len(dirname) > 0:
         os.makedirs(os.path.dirname(args.output))
 
-    with open(args.output, "w") as file:
-        yaml.dump(env, file)
+    _write_atomic(args.output, _yaml_dump(env))
+
+    if args.watch:
+        try:
+            merger.watch(
+                lambda merger: _write_atomic(args.output, _yaml_dump(render(merger))),
+                interval=args.interval,
+            )
+        except KeyboardInterrupt:
+            pass
 
 
 def _conda_envfile_merge_cli():
@@ -1305,11 +3877,14 @@ def _conda_envfile_restrict_parser():
         help="Interpret the next file (``source`` or ``comparison``) as conda-forge feedstock.",
     )
     parser.add_argument("-a", "--append", type=str, action="append", default=[], help="Append deps")
+    parser.add_argument("-j", "--jobs", type=int, default=1, help="Number of processes.")
     parser.add_argument("source", type=str, nargs="?", help="Input file.")
     parser.add_argument("comparison", type=str, nargs="*", help="Comparison file(s).")
+    _add_cache_arguments(parser)
     return parser
 
 
+@_scoped_cache_arguments
 def conda_envfile_restrict(args: list[str]):
     """
     Command-line tool, see ``--help``.
@@ -1319,22 +3894,23 @@ def conda_envfile_restrict(args: list[str]):
 
     parser = _conda_envfile_restrict_parser()
     args = parser.parse_args(args)
+    _apply_cache_arguments(args)
 
-    if len(args.conda_forge) > 0:
+    if args.conda_forge:
         other = []
         with open(args.conda_forge[0]) as file:
-            source = unique(*condaforge_dependencies(file.read()))
-        if args.source:
-            other += parse_file(args.source)["dependencies"]
-        for filename in args.comparison:
-            other += parse_file(filename)["dependencies"]
+            source = condaforge_dependencies(file.read())
+        files = [args.source] + args.comparison if args.source else args.comparison
+        for env in _map(parse_file, files, args.jobs):
+            other += env["dependencies"]
         for filename in args.conda_forge[1:]:
             with open(filename) as file:
                 other += condaforge_dependencies(file.read())
-        ret = restrict(source, unique(*(other + filter_selectors(args.append))))
-        if ret != source:
+        restriction = RestrictionIndex.from_specs(other + filter_selectors(args.append))
+        ret = restriction.differences(source)
+        if len(ret) > 0:
             print("Difference found")
-            print("\n".join([i for i in ret if i not in source]))
+            print("\n".join(ret))
             return 1
         else:
             return 0
@@ -1342,19 +3918,21 @@ def conda_envfile_restrict(args: list[str]):
     env = parse_file(args.source)
 
     other = []
-    for filename in args.comparison:
-        other += parse_file(filename)["dependencies"]
+    for comparison in _map(parse_file, args.comparison, args.jobs):
+        other += comparison["dependencies"]
 
-    env["dependencies"] = restrict(source, unique(*(other + filter_selectors(args.append))))
-    env["dependencies"] = list(map(str, *env["dependencies"]))
+    restriction = RestrictionIndex.from_specs(other + filter_selectors(args.append))
+    env["dependencies"] = list(map(str, restriction.restrict(env["dependencies"])))
 
     if not args.output:
-        print(yaml.dump(env, default_flow_style=False, default_style="").strip())
+        print(_yaml_dump(env, default_flow_style=False, default_style="").strip())
         return 0
 
     dirname = os.path.dirname(args.output)
 
     if not args.force:
+        import click
+
         if os.path.isfile(args.output):
             if not click.confirm(f'Overwrite "{args.output:s}"?'):
                 raise OSError("Cancelled")
@@ -1366,7 +3944,7 @@ def conda_envfile_restrict(args: list[str]):
         os.makedirs(os.path.dirname(args.output))
 
     with open(args.output, "w") as file:
-        yaml.dump(env, file)
+        _yaml_dump(env, file)
 
 
 def _conda_envfile_restrict_cli():
@@ -1380,6 +3958,15 @@ def _conda_envfile_diff_parser():
 
     desc = """
     Print diff of two files.
+    Use ``--format json`` or ``--format jsonl`` for records
+    ``{"name": ..., "kind": ..., "a": ..., "b": ...}`` with ``kind`` one of
+    ``added``, ``removed``, ``narrowed``, ``widened``, ``conflicting``, ``changed``.
+
+    Use ``--matrix`` to compare any number of files: a package x file table of the packages that
+    are not specified identically by all files (or all packages with ``--all``).
+    With ``--format json`` or ``--format jsonl`` each package is
+    ``{"name": ..., "specs": {file: ...}, "ranges": [...], "contains": [[...]]}``
+    where ``contains[i][j]`` is ``true`` if ``ranges[i]`` is in ``ranges[j]``.
     """
     parser = argparse.ArgumentParser(formatter_class=_MyFmt, description=textwrap.dedent(desc))
     parser.add_argument("--version", action="version", version=version)
@@ -1390,10 +3977,22 @@ def _conda_envfile_diff_parser():
         default=[],
         help="Interpret the next file (``a`` or ``b``) as conda-forge feedstock.",
     )
+    parser.add_argument(
+        "--format",
+        type=str,
+        choices=["table", "csv", "json", "jsonl"],
+        default="table",
+        help="Output.",
+    )
+    parser.add_argument("--matrix", action="store_true", help="Compare any number of files.")
+    parser.add_argument("--all", action="store_true", help="Matrix: list all packages.")
+    parser.add_argument("-j", "--jobs", type=int, default=1, help="Number of processes.")
     parser.add_argument("files", type=str, nargs="*", help="Input files.")
+    _add_cache_arguments(parser)
     return parser
 
 
+@_scoped_cache_arguments
 def conda_envfile_diff(args: list[str]):
     """
     Command-line tool, see ``--help``.
@@ -1403,20 +4002,61 @@ def conda_envfile_diff(args: list[str]):
 
     parser = _conda_envfile_diff_parser()
     args = parser.parse_args(args)
+    _apply_cache_arguments(args)
 
-    diff = []
-    for filename in args.files:
-        diff += [parse_file(filename)["dependencies"]]
-        print(diff)
+    deps = [env["dependencies"] for env in _map(parse_file, args.files, args.jobs)]
 
     for filename in args.conda_forge:
         with open(filename) as file:
-            diff += [unique(*condaforge_dependencies(file.read()))]
+            deps += [condaforge_dependencies(file.read())]
+
+    if args.matrix:
+        labels = args.files + args.conda_forge
+        packages = diff_matrix(deps, divergent=not args.all)
+        header = ["name"] + labels
+        rows = [[i.name] + ["" if spec is None else spec for spec in i.specs] for i in packages]
+        records = [
+            {
+                "name": i.name,
+                "specs": dict(zip(labels, i.specs)),
+                "ranges": list(i.ranges),
+                "contains": list(map(list, i.contains)),
+            }
+            for i in packages
+        ]
+    else:
+        if len(deps) != 2:
+            raise ValueError("Need exactly two files")
+        differences = diff(*deps)
+        header = list(Difference._fields)
+        rows = [["" if i is None else i for i in item] for item in differences]
+        records = [i._asdict() for i in differences]
+
+    if args.format == "table" and not args.matrix:
+        print_diff(*deps)
+    elif args.format == "table":
+        import prettytable
+
+        out = prettytable.PrettyTable()
+        out.field_names = header
+        out.align = "l"
+        out.add_rows(rows)
+        print(out.get_string())
+    elif args.format == "csv":
+        import csv
 
-    if len(diff) != 2:
-        raise ValueError("Need exactly two files")
+        writer = csv.writer(sys.stdout, lineterminator="\n")
+        writer.writerow(header)
+        writer.writerows(rows)
+    elif args.format == "json":
+        import json
 
-    print_diff(*diff)
+        print(json.dumps(records, indent=2))
+    else:
+        import json
+
+        for record in records:
+            print(json.dumps(record))
 
 
 def _conda_envfile_diff_cli():
@@ -1471,9 +4111,11 @@ def _conda_envfile_pyproject_parser():
         "--pyproject", type=pathlib.Path, help="``pyproject.toml``", default="pyproject.toml"
     )
     parser.add_argument("environment", type=pathlib.Path, help="``environment.yaml``")
+    _add_cache_arguments(parser)
     return parser
 
 
+@_scoped_cache_arguments
 def conda_envfile_pyproject(args: list[str]):
     """
     Command-line tool, see ``--help``.
@@ -1482,8 +4124,11 @@ def conda_envfile_pyproject(args: list[str]):
     """
     parser = _conda_envfile_pyproject_parser()
     args = parser.parse_args(map(str, args))
+    _apply_cache_arguments(args)
 
     text_tml = args.pyproject.read_text()
+    import tomllib
+
     data_tml = tomllib.loads(text_tml)
     data_env = parse_file(args.environment)
     deps_tml = data_tml.get("project", {}).get("dependencies", None)
@@ -1523,7 +4168,7 @@ def conda_envfile_pyproject(args: list[str]):
 
     inv_aliases = {v: k for k, v in aliases.items()}
 
-    deps_tml_alias = copy.deepcopy(deps_tml)
+    deps_tml_alias = [i.copy() for i in deps_tml]
     for package in deps_tml_alias:
         package.name = aliases.get(package.name, package.name.lower())
 
@@ -1562,7 +4207,7 @@ def conda_envfile_pyproject(args: list[str]):
         for dep in deps_tml_alias:
             if dep.name not in lookup:
                 change_env = True
-                orig = copy.deepcopy(dep)
+                orig = dep.copy()
                 orig.name = aliases.get(dep.name, dep.name)
                 deps_env.append(orig)
 
@@ -1573,7 +4218,7 @@ def conda_envfile_pyproject(args: list[str]):
                 continue
             if dep.name not in lookup:
                 change_tml = True
-                orig = copy.deepcopy(dep)
+                orig = dep.copy()
                 orig.name = inv_aliases.get(dep.name, dep.name)
                 deps_tml.append(orig)
 
@@ -1627,8 +4272,108 @@ def conda_envfile_pyproject(args: list[str]):
     if change_env:
         data_env["dependencies"] = list(map(str, deps_env))
         with open(args.environment, "w") as file:
-            yaml.dump(data_env, file, sort_keys=False)
+            _yaml_dump(data_env, file, sort_keys=False)
 
 
 def _conda_envfile_pyproject_cli():
     conda_envfile_pyproject(sys.argv[1:])
+
+
+def _conda_envfile_feedstocks_parser():
+    """
+    Return parser for :py:func:`conda_envfile_feedstocks`.
+    """
+
+    desc = """
+    Check many conda-forge feedstocks against an environment.
+    Writes one JSON record per recipe (JSON Lines)::
+
+        {"recipe": "path/to/meta.yaml", "differences": ["foo >=1.2,<2", ...]}
+        {"recipe": "path/to/meta.yaml", "error": "..."}
+
+    with the dependencies of the recipe that are restricted by the environment.
+    Example::
+
+        conda_envfile_feedstocks -e env.yml -j 8 feedstocks/ > report.jsonl
+
+    The return code is ``1`` if any recipe has differences or errors.
+    """
+    parser = argparse.ArgumentParser(formatter_class=_MyFmt, description=textwrap.dedent(desc))
+    parser.add_argument("--version", action="version", version=version)
+    parser.add_argument("-f", "--force", action="store_true", help="Force overwrite output file.")
+    parser.add_argument("-o", "--output", type=str, help="Write to output file.")
+    parser.add_argument(
+        "-e", "--environment", type=str, action="append", required=True, help="Environment file."
+    )
+    parser.add_argument("-a", "--append", type=str, action="append", default=[], help="Append deps")
+    parser.add_argument(
+        "--from-file", type=str, help="Read recipes from file (one per line, ``-`` for stdin)."
+    )
+    parser.add_argument(
+        "-s", "--selector", type=str, action="append", default=[], help="Selector to keep."
+    )
+    parser.add_argument(
+        "--target-platform", type=str, default="myplatform", help="Substitute target_platform."
+    )
+    parser.add_argument("-j", "--jobs", type=int, default=1, help="Number of processes.")
+    parser.add_argument("recipes", type=str, nargs="*", help="Recipes and/or directories.")
+    _add_cache_arguments(parser)
+    return parser
+
+
+@_scoped_cache_arguments
+def conda_envfile_feedstocks(args: list[str]):
+    """
+    Command-line tool, see ``--help``.
+
+    :param args: Command-line arguments (should be all strings).
+    """
+    import json
+
+    parser = _conda_envfile_feedstocks_parser()
+    args = parser.parse_args(args)
+    _apply_cache_arguments(args)
+
+    recipes = list(args.recipes)
+    if args.from_file == "-":
+        recipes += [i.strip() for i in sys.stdin if len(i.strip()) > 0]
+    elif args.from_file:
+        with open(args.from_file) as file:
+            recipes += [i.strip() for i in file if len(i.strip()) > 0]
+
+    if args.output and os.path.isfile(args.output) and not args.force:
+        import click
+
+        if not click.confirm(f'Overwrite "{args.output:s}"?'):
+            raise OSError("Cancelled")
+
+    environment = []
+    for env in _map(parse_file, args.environment, args.jobs):
+        environment += env["dependencies"]
+    environment += filter_selectors(args.append)
+
+    reports = scan_feedstocks(
+        recipes,
+        environment,
+        workers=args.jobs,
+        selectors=args.selector,
+        target_platform=args.target_platform,
+    )
+
+    ret = 0
+    file = open(args.output, "w") if args.output else sys.stdout
+
+    try:
+        for report in reports:
+            file.write(json.dumps(report) + "\n")
+            if "error" in report or len(report["differences"]) > 0:
+                ret = 1
+    finally:
+        if args.output:
+            file.close()
+
+    return ret
+
+
+def _conda_envfile_feedstocks_cli():
+    sys.exit(conda_envfile_feedstocks(sys.argv[1:]))
@@ -1,4 +1,8 @@
+import json
 import pathlib
+import sys
+
+import pytest
 
 import conda_envfile
 
@@ -39,3 +43,175 @@ def test_condaforge_dependencies():
         "setuptools_scm",
         "tqdm",
     ]
+
+
+def test_condaforge_selectors():
+    text = "\n".join(
+        [
+            "requirements:",
+            "  run:",
+            "    - a  # [linux]",
+            "    - b  # [not win]",
+            "    - c  # [linux and x86_64]",
+            "    - d  # [py>=38]",
+            "    - e  # [py<38]",
+            "    - f  # [osx or win]",
+            "    - g  # [target_platform == 'linux-64']",
+            "    - h  # [build_platform != target_platform]",
+            "    - i  # [python_impl == 'pypy']",
+            "    - j  #[unix]",
+        ]
+    )
+
+    deps = list(map(str, conda_envfile.condaforge_dependencies(text)))
+    assert deps == ["b", "d", "e", "i"]
+
+    deps = conda_envfile.condaforge_dependencies(
+        text,
+        selectors=["linux", "x86_64", "unix", "build_platform != target_platform"],
+        target_platform="linux-64",
+        context={"py": 311},
+    )
+    assert list(map(str, deps)) == ["a", "b", "c", "d", "g", "h", "i", "j"]
+
+    deps = conda_envfile.condaforge_dependencies(text, selectors=["win"], context={"py": 37})
+    assert list(map(str, deps)) == ["e", "f", "i"]
+
+
+def test_scan_feedstocks(tmp_path, monkeypatch):
+    basedir = pathlib.Path(__file__).parent
+    (tmp_path / "a" / "recipe").mkdir(parents=True)
+    (tmp_path / "b" / "recipe").mkdir(parents=True)
+    (tmp_path / "a" / "recipe" / "meta.yaml").write_text((basedir / "condaforge.yaml").read_text())
+    (tmp_path / "b" / "recipe" / "meta.yaml").write_text("requirements: [")
+    env = tmp_path / "env.yml"
+    env.write_text("dependencies:\n  - python >=3.8\n  - numpy >=1.20\n  - tqdm\n")
+
+    environment = conda_envfile.parse_file(env)["dependencies"]
+    reports = list(conda_envfile.scan_feedstocks([tmp_path], environment))
+    assert len(reports) == 2
+    assert reports[0] == {
+        "recipe": str(tmp_path / "a" / "recipe" / "meta.yaml"),
+        "differences": ["numpy >=1.20", "python >=3.8"],
+    }
+    assert reports[1]["recipe"] == str(tmp_path / "b" / "recipe" / "meta.yaml")
+    assert "error" in reports[1]
+
+    assert list(conda_envfile.scan_feedstocks([tmp_path], environment, workers=2)) == reports
+
+    output = tmp_path / "report.jsonl"
+    ret = conda_envfile.conda_envfile_feedstocks(["-e", str(env), "-o", str(output), str(tmp_path)])
+    assert ret == 1
+    assert [json.loads(i) for i in output.read_text().splitlines()] == reports
+
+    # the installed script exits with the return code
+    argv = ["conda_envfile_feedstocks", "-e", str(env), "-f", "-o", str(output), str(tmp_path)]
+    monkeypatch.setattr(sys, "argv", argv)
+    with pytest.raises(SystemExit) as e:
+        conda_envfile._conda_envfile_feedstocks_cli()
+    assert e.value.code == 1
+
+
+def test_condaforge_jinja(tmp_path, monkeypatch):
+    text = "\n".join(
+        [
+            "requirements:",
+            "  host:",
+            "    - {{ compiler('cxx') }}",
+            "    - {{ pin_compatible('numpy', max_pin='x.x') }}",
+            "    - foo_{{ target_platform }}",
+            "  run:",
+            "    - {{ pin_subpackage('bar', exact=True) }}",
+        ]
+    )
+
+    conda_envfile.set_jinja_environment(cache_dir=tmp_path)
+    env = conda_envfile.get_jinja_environment()
+    compiled = []
+    compile = env.compile
+    monkeypatch.setattr(
+        env, "compile", lambda *args, **kwargs: compiled.append(1) or compile(*args, **kwargs)
+    )
+
+    try:
+        for platform in ["linux-64", "osx-arm64"]:
+            deps = conda_envfile.condaforge_dependencies(text, target_platform=platform)
+            assert list(map(str, deps)) == ["bar", "cxx-compiler", f"foo_{platform}", "numpy"]
+        assert len(compiled) == 1
+        assert len(list(tmp_path.iterdir())) == 1
+    finally:
+        conda_envfile.set_jinja_environment()
+
+
+def test_condaforge_platforms():
+    text = "\n".join(
+        [
+            "requirements:",
+            "  run:",
+            "    - a",
+            "    - b >=1.0  # [unix]",
+            "    - b >=1.2  # [osx]",
+            "    - c  # [win]",
+            "    - d  # [linux and aarch64]",
+            "    - e  # [py>=310]",
+        ]
+    )
+    platforms = ["linux-64", "linux-aarch64", "osx-arm64", {"target_platform": "win-64"}]
+    deps = conda_envfile.condaforge_platforms(text, platforms, context={"py": 39})
+    deps = {key: list(map(str, value)) for key, value in deps["platforms"].items()}
+    assert deps == {
+        "linux-64": ["a", "b >=1.0"],
+        "linux-aarch64": ["a", "b >=1.0", "d"],
+        "osx-arm64": ["a", "b >=1.2"],
+        "win-64": ["a", "c"],
+    }
+
+    for platform, selectors in [
+        ("linux-64", ["linux", "unix", "x86", "x86_64", "linux64"]),
+        ("osx-arm64", ["osx", "unix", "arm64"]),
+        ("win-64", ["win", "x86", "x86_64", "win64"]),
+    ]:
+        expect = conda_envfile.condaforge_dependencies(
+            text, selectors=selectors, target_platform=platform, context={"py": 39}
+        )
+        assert deps[platform] == list(map(str, expect))
+
+    platforms = [
+        "linux-64",
+        "osx-arm64",
+        {"target_platform": "linux-64", "name": "py310", "context": {"py": 310}},
+    ]
+    deps = conda_envfile.condaforge_platforms(text, platforms, context={"py": 39})
+    assert list(map(str, deps["platforms"]["py310"])) == ["a", "b >=1.0", "e"]
+    assert list(map(str, deps["intersection"])) == ["a", "b >=1.2"]
+    assert list(map(str, deps["union"])) == ["a", "b >=1.0", "e"]
+    assert deps["conflicts"] == {}
+
+    text = "\n".join(
+        [
+            "requirements:",
+            "  run:",
+            "    - numpy >=2.0  # [linux]",
+            "    - numpy <2.0  # [win]",
+            "    - scipy <1.0  # [linux]",
+            "    - scipy >=1.0  # [win]",
+            "    - pandas <1.0  # [linux]",
+            "    - pandas >1.0  # [win]",
+            "    - python >=3.10  # [linux]",
+            "    - python >=3.9,<3.13  # [win]",
+        ]
+    )
+    deps = conda_envfile.condaforge_platforms(text, ["linux-64", "win-64"])
+    assert list(map(str, deps["union"])) == [
+        "numpy",
+        "pandas <1.0",
+        "pandas >1.0",
+        "python >=3.9",
+        "scipy",
+    ]
+    assert list(map(str, deps["intersection"])) == ["python >=3.10, <3.13"]
+    assert deps["conflicts"] == {
+        "numpy": {"linux-64": "numpy >=2.0", "win-64": "numpy <2.0"},
+        "pandas": {"linux-64": "pandas <1.0", "win-64": "pandas >1.0"},
+        "scipy": {"linux-64": "scipy <1.0", "win-64": "scipy >=1.0"},
+    }
@@ -0,0 +1,73 @@
+import os
+import pathlib
+import subprocess
+import sys
+
+import pytest
+
+import conda_envfile
+
+# modules that are only loaded in the code paths that use them
+_lazy = ["click", "concurrent.futures", "jinja2", "prettytable", "tomllib", "yaml"]
+
+
+def _importtime(code: str) -> dict[str, int]:
+    """
+    Run ``code`` in a fresh interpreter with ``python -X importtime``.
+
+    :param code: Python code.
+    :return: Cumulative import time (in microseconds) of each imported module.
+    """
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        [str(pathlib.Path(conda_envfile.__file__).parents[1]), env.get("PYTHONPATH", "")]
+    )
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    ret = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line.split("|")
+        if not cumulative.strip().isdigit():
+            continue
+        ret[name.strip()] = int(cumulative)
+    return ret
+
+
+def test_import_lazy():
+    modules = _importtime("import conda_envfile")
+    assert "conda_envfile" in modules
+    for name in _lazy:
+        assert name not in modules
+
+
+def test_import_parse(tmp_path):
+    env = tmp_path / "env.yml"
+    env.write_text("dependencies:\n  - foo >=1.2\n")
+    modules = _importtime(
+        f"import conda_envfile; conda_envfile.conda_envfile_parse([{str(env)!r}])"
+    )
+    assert "yaml" in modules
+    for name in ["click", "jinja2", "prettytable", "tomllib"]:
+        assert name not in modules
+
+
+@pytest.mark.skipif(
+    "CONDA_ENVFILE_IMPORT_BUDGET" not in os.environ,
+    reason="opt-in: set CONDA_ENVFILE_IMPORT_BUDGET (microseconds)",
+)
+def test_import_time():
+    """
+    Startup time of ``import conda_envfile`` (best of three runs).
+    Wall-clock dependent, therefore opt-in: set the budget in microseconds in the environment
+    variable ``CONDA_ENVFILE_IMPORT_BUDGET``.
+    """
+    budget = int(os.environ["CONDA_ENVFILE_IMPORT_BUDGET"])
+    best = min(_importtime("import conda_envfile")["conda_envfile"] for _ in range(3))
+    assert best < budget
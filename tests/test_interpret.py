@@ -0,0 +1,203 @@
+import random
+import re
+import warnings
+
+import pytest
+
+import conda_envfile
+from conda_envfile import VersionRange
+
+
+def _interpret_legacy(dependency: str) -> dict:
+    """
+    Reference implementation: cascade of regular expressions (before the single-pass tokenizer).
+    """
+
+    if dependency is None:
+        return {}
+
+    dep = dependency
+
+    if "#" in dep:
+        dep, comment = dep.split("#", 1)
+        warnings.warn(f"Comment '{comment}' ignored.", Warning)
+
+    if re.match(r"^([^=^<^>^\s]*)(\s*)(==)(.*)$", dep):
+        _, name, _, eq, _, version, _ = re.split(r"^([^=^<^>^\s]*)(\s*)(==)(\s*)(.*)$", dep)
+
+        if "=" in version:
+            raise ValueError(f"Invalid build specifier '{dep}'.")
+
+        return {
+            "name": name,
+            "wildcard": eq + version,
+            "range": VersionRange(equal=version),
+        }
+
+    if re.match(r"^([^=^<^>^\s]*)(\s*)([=]+)([^=^<^>^\s]*)(\s*)([=]+)(.*)$", dep):
+        _, name, _, eq, version, _, eq2, build, _ = re.split(
+            r"^([^=^<^>^\s]*)(\s*)([=]+)([^=^<^>^\s]*)(\s*)([=]+)(.*)$", dep
+        )
+
+        if eq != "=":
+            raise ValueError(f"Invalid version specification '{dep}'.")
+
+        if eq2 != "=":
+            raise ValueError(f"Invalid build specifier '{dep}'.")
+
+        return {"name": name, "build": build, "range": VersionRange(equal=version)}
+
+    if re.match(r"^([^=^\s]*)(\s*)([=]+)([^\*]*)(\*)$", dep):
+        _, name, _, eq, _, basename, wildcard, _ = re.split(
+            r"^([^=^\s]*)(\s*)([=]*)(\s*)([^\*]*)(\*)$", dep
+        )
+
+        if eq != "=":
+            raise ValueError(f"Invalid wildcard dependency '{dep}'.")
+
+        lower = basename.rstrip(".")
+        if len(lower.split(".")) == 1:
+            upper = f"{int(lower) + 1}"
+            if basename[-1] == ".":
+                upper += ".0"
+        else:
+            base, minor = lower.rsplit(".", 1)
+            upper = f"{base}.{int(minor) + 1}.0"
+
+        if len(lower) == 0:
+            lower = "0"
+        else:
+            lower = f"{lower}.0"
+
+        return {
+            "name": name,
+            "wildcard": eq + basename + wildcard,
+            "range": VersionRange(greater_equal=lower, less=upper),
+        }
+
+    if re.match(r"^([^=^<^>^\s]*)(\s*)([=]+)([^=^<^>^\s]*)$", dep):
+        _, name, _, eq, basename, _ = re.split(r"^([^=^\s]*)(\s*)([=]+)(.*)$", dep)
+
+        if eq != "=":
+            raise ValueError(f"Invalid version specification '{dep}'.")
+
+        lower = basename.rstrip(".")
+        if len(lower.split(".")) == 1:
+            upper = f"{int(lower) + 1}"
+            if basename[-1] == ".":
+                upper += ".0"
+        else:
+            base, minor = lower.rsplit(".", 1)
+            upper = f"{base}.{int(minor) + 1}.0"
+
+        if len(lower) == 0:
+            lower = "0"
+        else:
+            lower = f"{lower}.0"
+
+        return {
+            "name": name,
+            "wildcard": eq + basename,
+            "range": VersionRange(greater_equal=lower, less=upper),
+        }
+
+    if re.match(r"^([^\*^\s]*)(\s*)(\*)$", dep):
+        _, name, _, wildcard, _ = re.split(r"^([^\*^\s]*)(\s*)(\*)$", dep)
+        return {"name": name, "wildcard": wildcard, "range": VersionRange()}
+
+    _, name, _, eq, _, ver, _ = re.split(r"^([^>^<^=^\s]*)(\s*)([<>=]*)(\s*)(.*)$", dep)
+    eq2 = None
+    ver2 = None
+    sp = re.split(r"^([^,]*)(,)(\s*)([<>=]*)(\s*)(.*)$", ver)
+    if len(sp) > 1:
+        _, ver, _, _, eq2, _, ver2, _ = sp
+
+    ret = {"name": name, "range": VersionRange()}
+
+    if eq == "=" and eq2:
+        raise ValueError(f"Cannot have two equalities in '{dep}'")
+    if eq in [">=", ">"] and eq2 in [">=", ">"]:
+        raise ValueError(f"Illegal bound in '{dep}'")
+
+    for e, v in [(eq, ver), (eq2, ver2)]:
+        if not e:
+            if v:
+                raise ValueError(f"Missing equality in '{dep}'")
+            continue
+        ret["range"].set(e, v)
+
+    return ret
+
+
+def _outcome(func, dependency):
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        try:
+            data = func(dependency)
+        except Exception as e:
+            return type(e)
+    data["range"] = str(data["range"])
+    return data
+
+
+def _corpus(n: int, seed: int = 0) -> list[str]:
+    tokens = [
+        "foo",
+        "foo-bar",
+        "py_3",
+        "^",
+        " ",
+        "  ",
+        "=",
+        "==",
+        "<",
+        ">",
+        "<=",
+        ">=",
+        ",",
+        ", ",
+        "*",
+        ".",
+        "0",
+        "1",
+        "1.",
+        "1.0",
+        "2.10",
+        "1.2.3",
+        "1.0a1",
+        "pypy",
+        "#x",
+    ]
+    rng = random.Random(seed)
+    return ["".join(rng.choices(tokens, k=rng.randint(1, 7))) for _ in range(n)]
+
+
+def test_interpret_examples():
+    deps = [
+        "foo",
+        "foo *",
+        "foo=1.0=pypy",
+        "foo ==1.0",
+        "foo =1.0",
+        "foo =1.0.*",
+        "foo =1.*",
+        "foo >1.0, <2.0",
+        "foo >=1.0, <=2.0",
+        "foo >=1.0 , <2.0",
+        "foo<=1.*",
+        "foo==1.0=pypy",
+        "foo =*",
+    ]
+
+    for dep in deps:
+        assert _outcome(conda_envfile._interpret, dep) == _outcome(_interpret_legacy, dep)
+
+
+def test_interpret_fuzz():
+    for dep in _corpus(20000):
+        assert _outcome(conda_envfile._interpret, dep) == _outcome(_interpret_legacy, dep), dep
+
+
+def test_interpret_invalid():
+    with pytest.raises(ValueError):
+        conda_envfile.PackageSpecifier("foo\nbar >1.0")
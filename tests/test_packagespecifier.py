@@ -158,3 +158,56 @@ def test_interpret():
     for dep in illegal:
         with pytest.raises(ValueError):
             conda_envfile.PackageSpecifier(dep)
+
+
+def test_specifier_cache():
+    conda_envfile.specifier_cache_clear()
+    a = conda_envfile.PackageSpecifier("foo >=1.0, <2.0")
+    b = conda_envfile.PackageSpecifier("foo >=1.0, <2.0")
+    info = conda_envfile.specifier_cache_info()
+    assert info.hits == 1
+    assert info.misses == 1
+    assert info.currsize == 1
+
+    b.range.less = "1.5"
+    assert str(a) == "foo >=1.0, <2.0"
+    assert str(b) == "foo >=1.0, <1.5"
+    assert str(conda_envfile.PackageSpecifier("foo >=1.0, <2.0")) == "foo >=1.0, <2.0"
+
+    conda_envfile.specifier_cache_resize(1)
+    conda_envfile.PackageSpecifier("bar")
+    info = conda_envfile.specifier_cache_info()
+    assert info.evictions == 1
+    assert info.currsize == 1
+
+    conda_envfile.specifier_cache_resize(16384)
+    conda_envfile.specifier_cache_clear()
+
+
+def test_canonical():
+    PackageSpecifier = conda_envfile.PackageSpecifier
+    a = PackageSpecifier("foo =1.2")
+    b = PackageSpecifier("foo >=1.2.0, <1.3.0")
+    c = PackageSpecifier("foo >=1.2.0, <1.3.0")
+    assert a != b
+    assert a.same(b)
+    assert a.same("foo >=1.2, <1.3")
+    assert not a.same("foo >=1.2")
+    assert not a.same("bar =1.2")
+    assert not PackageSpecifier("foo=1.2=abc").same("foo=1.2=def")
+    assert a.canonical() == b.canonical()
+    assert a.range.canonical() == b.range.canonical()
+    assert PackageSpecifier("foo ==1.2").range.same(PackageSpecifier("foo ==1.2.0").range)
+
+    assert hash(b) == hash(c)
+    assert len({a, b, c}) == 2
+    assert len({i.canonical() for i in [a, b, c]}) == 1
+    assert len({a.range, b.range, c.range}) == 1
+    assert {b: 1}[c] == 1
+
+    # comparison with other types
+    assert PackageSpecifier("foo") == "foo"
+    assert PackageSpecifier("foo") != "bar"
+    assert PackageSpecifier("foo") != None  # noqa: E711
+    assert PackageSpecifier("foo") not in [None, 1]
+    assert a.range != None  # noqa: E711
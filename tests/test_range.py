@@ -1,3 +1,5 @@
+import random
+
 import pytest
 
 import conda_envfile
@@ -81,6 +83,9 @@ def test_VersionRange_in():
         [dict(less="1.0"), False, dict(greater="0.5", less_equal="1.0")],
         [dict(less="1.0"), False, dict(greater_equal="0.5", less="1.0")],
         [dict(less="1.0"), False, dict(greater_equal="0.5", less_equal="1.0")],
+        [dict(less="1.0"), False, dict(greater_equal="1.0")],
+        [dict(less="1.4"), False, dict(greater_equal="1.2")],
+        [dict(greater="1.2"), False, dict(less="1.4")],
     ]
 
     for test, cmp, other in tests:
@@ -91,3 +96,132 @@ def test_VersionRange_in():
             assert t in o
         else:
             assert t not in o
+
+
+def test_range_algebra():
+    VersionRange = conda_envfile.VersionRange
+    EMPTY = conda_envfile.EMPTY
+
+    a = VersionRange(greater_equal="1.0", less="2.0")
+    b = VersionRange(greater="1.5")
+    c = VersionRange(less="1.0")
+    assert str(conda_envfile.intersect(a, b)) == ">1.5, <2.0"
+    assert conda_envfile.intersect(a, c) is EMPTY
+    assert not EMPTY
+    assert conda_envfile.is_disjoint(a, c)
+    assert not conda_envfile.is_disjoint(a, b)
+    assert conda_envfile.subset(VersionRange(equal="1.2"), a)
+    assert conda_envfile.subset(VersionRange(equal="1.2"), VersionRange(equal="1.2.0"))
+    assert VersionRange(equal="1.2") not in VersionRange(equal="1.2.0")
+    assert list(map(str, conda_envfile.union(b, c, a))) == [""]
+    assert list(map(str, conda_envfile.union(b, c))) == ["<1.0", ">1.5"]
+    assert conda_envfile.union() == []
+
+    # string rules of merging: longest string on equal bounds, else that of ``b``
+    tests = [
+        [dict(less="2.0"), dict(less="2"), "<2.0"],
+        [dict(less="2"), dict(less="2.0"), "<2.0"],
+        [dict(less="2.0"), dict(less="2.1"), "<2.0"],
+        [dict(greater_equal="1", less="2"), dict(less_equal="1.0"), "==1.0"],
+        [dict(equal="1.0"), dict(equal="1"), "==1.0"],
+        [dict(equal="1"), dict(equal="1.0"), "==1"],
+    ]
+
+    for a, b, expect in tests:
+        assert str(conda_envfile.intersect(VersionRange(**a), VersionRange(**b))) == expect
+        assert str(VersionRange(**a) + VersionRange(**b)) == expect
+
+    # brute force: compare to membership of sampled versions
+    random.seed(0)
+    bounds = ["1", "2", "3", "4"]
+    points = ["0.5", "1", "1.5", "2", "2.5", "3", "3.5", "4", "4.5"]
+    keys = [conda_envfile._version_key(p) for p in points]
+    ops = ["less", "less_equal", "greater", "greater_equal", "equal"]
+
+    def sample():
+        while True:
+            kwargs = {op: random.choice(bounds) for op in random.sample(ops, random.randint(0, 2))}
+            try:
+                return VersionRange(**kwargs)
+            except ValueError:
+                pass
+
+    def members(rng):
+        lower, upper = conda_envfile._range_interval(rng)
+        return {p for p, key in zip(points, keys) if lower <= (key, 0) <= upper}
+
+    for _ in range(2000):
+        a = sample()
+        b = sample()
+        ret = conda_envfile.intersect(a, b)
+        common = members(a) & members(b)
+        assert members(ret) == common if ret is not EMPTY else not common
+        assert conda_envfile.is_disjoint(a, b) == (not common)
+        assert conda_envfile.subset(a, b) == (members(a) <= members(b))
+        assert (a in b) == (members(a) <= members(b)) or (a.eq and b.eq)
+        parts = conda_envfile.union(a, b)
+        assert set().union(*map(members, parts)) == members(a) | members(b)
+        assert all(conda_envfile.is_disjoint(x, y) for x, y in zip(parts, parts[1:]))
+        if ret is EMPTY:
+            with pytest.raises(ValueError):
+                a + b
+        else:
+            assert str(a + b) == str(ret)
+
+
+def test_merge_cache():
+    VersionRange = conda_envfile.VersionRange
+
+    with conda_envfile.merge_cache(maxsize=16):
+        a = VersionRange(greater_equal="3.9")
+        b = VersionRange(less="3.13")
+        c = a + b
+        c.less = "3.12"
+        assert str(a + b) == ">=3.9, <3.13"
+        assert str(VersionRange(less="2.0") + VersionRange(less="2")) == "<2.0"
+        assert str(VersionRange(less="2") + VersionRange(less="2.0")) == "<2.0"
+        assert a + b in b
+        assert a + b in b
+        assert a not in b
+
+        for _ in range(2):
+            with pytest.raises(ValueError):
+                a + VersionRange(less="3.0")
+
+        info = conda_envfile.merge_cache_info()
+        assert info["merge"] == (4, 4, 0, 16, 4)
+        assert info["contains"] == (1, 2, 0, 16, 2)
+
+        with conda_envfile.merge_cache(maxsize=0):
+            assert str(a + b) == ">=3.9, <3.13"
+            assert conda_envfile.merge_cache_info()["merge"] == (0, 0, 0, 0, 0)
+
+        assert conda_envfile.merge_cache_info() == info
+        conda_envfile.merge_cache_clear()
+        assert conda_envfile.merge_cache_info()["merge"] == (0, 0, 0, 16, 0)
+
+    with conda_envfile.merge_cache(maxsize=2):
+        for upper in ["5", "6", "7", "5"]:
+            a + VersionRange(less=upper)
+        assert conda_envfile.merge_cache_info()["merge"] == (0, 4, 2, 2, 2)
+
+
+def test_VersionRange_copy():
+    a = conda_envfile.VersionRange(greater_equal="1.0")
+    b = conda_envfile.VersionRange(less="2.0")
+    c = a + b
+    assert str(c) == ">=1.0, <2.0"
+    assert str(a) == ">=1.0"
+    assert c._lt is b._lt
+
+    d = c.copy()
+    d.less = "1.5"
+    assert str(c) == ">=1.0, <2.0"
+    assert str(d) == ">=1.0, <1.5"
+
+
+def test_VersionRange_slots():
+    v = conda_envfile.VersionRange(greater_equal="1.0", less="2.0")
+    assert not hasattr(v, "__dict__")
+    assert isinstance(v._ge, tuple)
+    assert v._ge < v._lt
@@ -1,3 +1,8 @@
+import json
+import os
+import pathlib
+import random
+
 import pytest
 
 import conda_envfile
@@ -73,6 +78,7 @@ def test_unique():
             nospace = [i.replace(" ", "") for i in deps]
             assert list(map(str, conda_envfile.unique(*deps))) == expect
             assert list(map(str, conda_envfile.unique(*nospace))) == expect
+            assert list(map(str, conda_envfile.unique_many(deps * 3))) == expect
 
     illegal = [
         ["foo >1.2.0", "foo <1.2.0", "foo", "foo *", "foo =1.2.*"],
@@ -89,6 +95,8 @@ def test_unique():
                 conda_envfile.unique(*deps)
             with pytest.raises(ValueError):
                 conda_envfile.unique(*[i.replace(" ", "") for i in deps])
+            with pytest.raises(ValueError):
+                conda_envfile.unique_many(iter(deps))
 
 
 def test_remove():
@@ -97,6 +105,13 @@ def test_remove():
     assert conda_envfile.remove(["foo =1.*", "bar =1.*"], "bar") == ["foo =1.*"]
     assert conda_envfile.remove(["foo >1.0", "bar >1.0"], "bar") == ["foo >1.0"]
 
+    deps = ["foo >=1.0, <2", "bar=1.0=abc", "baz ==1.0", "qux =1.*", "quux<2", "corge *"]
+    ret = conda_envfile.iter_remove(iter(deps), "bar", "qux >1.0", "quux", "corge *")
+    assert not isinstance(ret, list)
+    assert list(ret) == ["foo >=1.0, <2", "baz ==1.0"]
+    for dep in deps:
+        assert conda_envfile._specifier_name(dep) == conda_envfile.PackageSpecifier(dep).name
+
 
 def test_contains():
     requirements = ["foo >1.0", "bar >=2.0"]
@@ -106,6 +121,40 @@ def test_contains():
     installed = ["foo=2.0=generic", "bar=1.0=generic", "other"]
     assert not conda_envfile.contains(requirements, installed)
 
+    # one-sided ranges: all versions of the installed range must satisfy the requirement
+    assert not conda_envfile.contains(["foo >1.0"], ["foo <1.0"])
+    assert not conda_envfile.contains(["foo <2.0"], ["foo >1.0"])
+    assert not conda_envfile.contains(["foo >=1.2"], ["foo <1.4"])
+    assert not conda_envfile.contains(["foo >=1.2"], ["foo >=1.0, <2.0"])
+    assert conda_envfile.contains(["foo >=1.0"], ["foo >=1.5, <2.0"])
+    assert conda_envfile.contains(["foo <2.0"], ["foo <1.5"])
+
+
+def test_InstalledIndex(tmp_path):
+    export = tmp_path / "installed.txt"
+    export.write_text(
+        "# This file may be used to create an environment using:\n"
+        "# $ conda create --name <env> --file <this file>\n"
+        "# platform: linux-64\n"
+        "foo=2.0=generic\n"
+        "bar=1.0=generic\n"
+        "\n"
+        "other=0.1=pypi_0\n"
+    )
+    index = conda_envfile.InstalledIndex.from_file(export)
+    assert len(index) == 3
+    assert "other" in index
+
+    sets = [["foo >1.0", "other"], ["foo >1.0", "bar >=2.0", "baz"], []]
+    assert index.check_many(sets) == [True, False, True]
+    assert index.check_many(sets, report=True) == [
+        [],
+        [("bar >=2.0", "bar=1.0=generic"), ("baz", None)],
+        [],
+    ]
+    assert conda_envfile.contains(["foo >1.0"], index)
+    assert not conda_envfile.contains(["foo >2.0"], index)
+
 
 def test_restrict():
     ret = list(map(str, conda_envfile.restrict(["foo", "bar"], ["foo >1.0"])))
@@ -113,3 +162,454 @@ def test_restrict():
 
     ret = conda_envfile.restrict(["foo", "bar"], ["foo >1.0"])
     assert ret == list(map(conda_envfile.PackageSpecifier, ["foo >1.0", "bar"]))
+
+    index = conda_envfile.RestrictionIndex.from_specs(["foo >1.0", "foo <3", "baz =1.*"])
+    assert len(index) == 2
+    assert "foo" in index
+    assert str(index["foo"]) == "foo >1.0, <3"
+    for _ in range(2):
+        ret = conda_envfile.restrict(["foo", "bar", "baz"], index)
+        assert list(map(str, ret)) == ["foo >1.0, <3", "bar", "baz =1.*"]
+        ret[0].range.less = "2"
+    assert list(map(str, index.restrict(["foo <2", "baz =1.2"]))) == ["foo >1.0, <2", "baz =1.2"]
+    assert index.differences(["foo <2", "baz =1.*", "bar"]) == ["foo >1.0, <2"]
+
+
+def test_diff(tmp_path, capsys):
+    a = ["foo >=1.2", "bar =1.*", "baz <2", "qux >=1", "quux", "corge >=1,<3", "grault =1=abc"]
+    b = ["foo >=1.2,<1.4", "baz <3", "qux <1", "corge >=2,<4", "grault =1=def", "garply"]
+
+    Difference = conda_envfile.Difference
+    assert conda_envfile.diff(a, b) == [
+        Difference("bar", "removed", "bar =1.*", None),
+        Difference("baz", "widened", "baz <2", "baz <3"),
+        Difference("corge", "changed", "corge >=1, <3", "corge >=2, <4"),
+        Difference("foo", "narrowed", "foo >=1.2", "foo >=1.2, <1.4"),
+        Difference("garply", "added", None, "garply"),
+        Difference("grault", "changed", "grault=1=abc", "grault=1=def"),
+        Difference("quux", "removed", "quux", None),
+        Difference("qux", "conflicting", "qux >=1", "qux <1"),
+    ]
+    assert conda_envfile.diff(["foo =1.2"], ["foo >=1.2,<1.3"]) == []
+
+    # the table lists the entries of ``a`` not in ``b``, then those only in ``b``
+    table = conda_envfile.print_diff(a, b, silent=True)
+    assert table.rows == [
+        ["foo >=1.2", "!=", "foo >=1.2, <1.4"],
+        ["bar =1.*", "->", ""],
+        ["qux >=1", "!=", "qux <1"],
+        ["quux", "->", ""],
+        ["corge >=1, <3", "!=", "corge >=2, <4"],
+        ["", "<-", "garply"],
+    ]
+
+    # sorted by name (case-insensitive); same range written differently is not different
+    a = ["Zeta", "alpha ==1.2", "Beta >=1"]
+    b = ["alpha ==1.2.0", "beta <1", "gamma"]
+    assert [(i.name, i.kind) for i in conda_envfile.diff(a, b)] == [
+        ("Beta", "removed"),
+        ("beta", "added"),
+        ("gamma", "added"),
+        ("Zeta", "removed"),
+    ]
+    assert conda_envfile.print_diff(a, b, silent=True).rows == [
+        ["Zeta", "->", ""],
+        ["alpha ==1.2", "!=", "alpha ==1.2.0"],
+        ["Beta >=1", "->", ""],
+        ["", "<-", "beta <1"],
+        ["", "<-", "gamma"],
+    ]
+
+    (tmp_path / "a.yml").write_text("dependencies:\n  - foo >=1.2\n  - bar\n")
+    (tmp_path / "b.yml").write_text("dependencies:\n  - foo <1.4\n")
+    files = [str(tmp_path / "a.yml"), str(tmp_path / "b.yml")]
+    conda_envfile.conda_envfile_diff(["--format", "jsonl", *files])
+    lines = capsys.readouterr().out.splitlines()
+    assert [json.loads(line) for line in lines] == [
+        {"name": "bar", "kind": "removed", "a": "bar", "b": None},
+        {"name": "foo", "kind": "changed", "a": "foo >=1.2", "b": "foo <1.4"},
+    ]
+
+
+def test_diff_matrix(tmp_path, capsys):
+    deps = [
+        ["foo >=1.2", "bar =1.2", "baz"],
+        ["foo >=1.2,<2", "bar >=1.2,<1.3", "baz"],
+        ["foo >=1.2", "baz"],
+    ]
+
+    Divergence = conda_envfile.Divergence
+    expect = [
+        Divergence("bar", ("bar =1.2", "bar >=1.2, <1.3", None), ("bar =1.2",), ((True,),)),
+        Divergence(
+            "foo",
+            ("foo >=1.2", "foo >=1.2, <2", "foo >=1.2"),
+            ("foo >=1.2", "foo >=1.2, <2"),
+            ((True, False), (True, True)),
+        ),
+    ]
+    assert conda_envfile.diff_matrix(deps) == expect
+    assert len(conda_envfile.diff_matrix(deps, divergent=False)) == 3
+
+    # memoised comparisons agree with ``in`` (that compares ``==`` ranges by string)
+    specs = ["==1.2", "==1.2.0", ">=1.2", "<2", ">=1.2.0, <1.3", "=1.2"]
+    many = [[f"{name} {spec}" for name in ["a", "b", "c"]] for spec in specs]
+    many += [[f"{name} {spec}" for name in ["b", "c"]] for spec in reversed(specs)]
+    for package in conda_envfile.diff_matrix(many):
+        ranges = [conda_envfile.PackageSpecifier(i).range for i in package.ranges]
+        assert package.contains == tuple(tuple(a in b for b in ranges) for a in ranges)
+
+    files = []
+    for i, dep in enumerate(deps):
+        files.append(str(tmp_path / f"env{i}.yml"))
+        pathlib.Path(files[-1]).write_text("dependencies:\n" + "".join(f"  - {d}\n" for d in dep))
+
+    conda_envfile.conda_envfile_diff(["--matrix", "--format", "csv", *files])
+    lines = capsys.readouterr().out.splitlines()
+    assert lines == [
+        ",".join(["name"] + files),
+        'bar,bar =1.2,"bar >=1.2, <1.3",',
+        'foo,foo >=1.2,"foo >=1.2, <2",foo >=1.2',
+    ]
+
+    conda_envfile.conda_envfile_diff(["--matrix", "--format", "jsonl", *files])
+    lines = capsys.readouterr().out.splitlines()
+    assert json.loads(lines[1]) == {
+        "name": "foo",
+        "specs": dict(zip(files, expect[1].specs)),
+        "ranges": list(expect[1].ranges),
+        "contains": [[True, False], [True, True]],
+    }
+
+
+def test_iter_parse_files(tmp_path):
+    (tmp_path / "a.yaml").write_text(
+        "name: foo\nchannels:\n- conda-forge\ndependencies:\n- bar >1.0\n"
+    )
+    (tmp_path / "b.yaml").write_text("dependencies:\n- bar <2.0\n- &baz baz\n- *baz\n")
+    (tmp_path / "c.yaml").write_text("")
+    files = [tmp_path / "a.yaml", tmp_path / "b.yaml", tmp_path / "c.yaml"]
+
+    ret = [(pathlib.Path(f).name, k, str(v)) for f, k, v in conda_envfile.iter_parse_files(*files)]
+    assert ret == [
+        ("a.yaml", "name", "foo"),
+        ("a.yaml", "channels", "conda-forge"),
+        ("a.yaml", "dependencies", "bar >1.0"),
+        ("b.yaml", "dependencies", "bar <2.0"),
+        ("b.yaml", "dependencies", "baz"),
+        ("b.yaml", "dependencies", "baz"),
+    ]
+
+    env = conda_envfile.parse_file(*files)
+    assert env["name"] == "foo"
+    assert env["channels"] == ["conda-forge"]
+    assert list(map(str, env["dependencies"])) == ["bar >1.0", "bar <2.0", "baz", "baz"]
+
+    (tmp_path / "d.yaml").write_text("foo:\n  bar: 1\n")
+    with pytest.raises(ValueError):
+        conda_envfile.parse_file(tmp_path / "d.yaml")
+
+
+def test_yaml_backend(tmp_path):
+    (tmp_path / "a.yaml").write_text("channels:\n- conda-forge\ndependencies:\n- bar >1.0\n- foo\n")
+    backend = conda_envfile.get_yaml_backend()
+
+    ret = []
+    for name in ["python", "auto"]:
+        conda_envfile.set_yaml_backend(name)
+        conda_envfile.conda_envfile_merge([str(tmp_path / "a.yaml"), "-o", str(tmp_path / name)])
+        ret.append((tmp_path / name).read_text())
+
+    assert ret[0] == ret[1]
+
+    with pytest.raises(ValueError):
+        conda_envfile.set_yaml_backend("foo")
+
+    conda_envfile.set_yaml_backend(backend)
+
+
+def test_parse_file_workers(tmp_path):
+    files = []
+    for i in range(4):
+        files.append(tmp_path / f"env{i}.yaml")
+        files[-1].write_text(f"channels:\n- conda-forge\ndependencies:\n- foo >={i}.0\n- bar{i}\n")
+
+    serial = conda_envfile.parse_file(*files)
+    parallel = conda_envfile.parse_file(*files, workers=2)
+    assert list(map(str, serial["dependencies"])) == list(map(str, parallel["dependencies"]))
+    assert serial["channels"] == parallel["channels"]
+
+    out = tmp_path / "restricted.yaml"
+    args = ["-j", "2", "-o", str(out), str(files[0]), str(files[2]), str(files[3])]
+    conda_envfile.conda_envfile_restrict(args)
+    assert conda_envfile.parse_file(out)["dependencies"] == ["foo >=3.0", "bar0"]
+
+
+def test_disk_cache(tmp_path, monkeypatch):
+    env = tmp_path / "env.yaml"
+    env.write_text("channels:\n- conda-forge\ndependencies:\n- foo >1.0\n- bar\n")
+    cache = tmp_path / "cache"
+    monkeypatch.setattr(conda_envfile, "_disk_cache", False)
+
+    # the first call reformats the file, the second call finds it unchanged
+    conda_envfile.conda_envfile_parse(["--cache-dir", str(cache), str(env)])
+    conda_envfile.conda_envfile_parse(["--cache-dir", str(cache), str(env)])
+    assert len(list(cache.iterdir())) == 2
+
+    # the command-line options only apply to the call
+    assert conda_envfile._get_disk_cache() is None
+
+    def _raise(*args, **kwargs):
+        raise AssertionError("YAML parsed")
+
+    conda_envfile.enable_disk_cache(str(cache))
+
+    with monkeypatch.context() as m:
+        m.setattr(conda_envfile, "_iter_yaml_mapping", _raise)
+        ret = conda_envfile.parse_file(env)
+        assert list(map(str, ret["dependencies"])) == ["bar", "foo >1.0"]
+
+    conda_envfile.conda_envfile_parse(["--no-cache", str(env)])
+    assert conda_envfile._get_disk_cache() is not None
+
+    conda_envfile.disable_disk_cache()
+
+    with monkeypatch.context() as m:
+        m.setattr(conda_envfile, "_iter_yaml_mapping", _raise)
+        with pytest.raises(AssertionError):
+            conda_envfile.parse_file(env)
+
+
+def test_IncrementalMerger(tmp_path):
+    files = []
+    for i in range(4):
+        files.append(tmp_path / f"env{i}.yaml")
+        files[-1].write_text(f"channels:\n- conda-forge\ndependencies:\n- foo >={i}.0\n- bar{i}\n")
+
+    def expected():
+        env = conda_envfile.parse_file(*files)
+        deps = conda_envfile.unique(*(env["dependencies"] + ["foo <9"]))
+        return list(map(str, conda_envfile.remove(deps, "bar3")))
+
+    merger = conda_envfile.IncrementalMerger(files, append=["foo <9"], remove=["bar3"])
+    assert list(map(str, merger.dependencies())) == expected()
+    assert merger.env()["channels"] == ["conda-forge"]
+    assert merger.poll() == set()
+
+    files[1].write_text("dependencies:\n- foo >=8.0\n- baz =1.2\n")
+    os.utime(files[1], ns=(0, 0))
+    assert merger.poll() == {"foo", "bar1", "baz"}
+    assert list(map(str, merger.dependencies())) == expected()
+
+    updated = []
+    files[2].write_text("dependencies:\n- bar2 >1.0\n")
+    merger.watch(updated.append, interval=0, count=1)
+    assert updated == [merger]
+    assert list(map(str, merger.dependencies())) == expected()
+
+    out = tmp_path / "merged.yaml"
+    conda_envfile.conda_envfile_merge(
+        ["-a", "foo <9", "-r", "bar3", "-o", str(out), *map(str, files)]
+    )
+    assert list(map(str, conda_envfile.parse_file(out)["dependencies"])) == expected()
+
+
+def test_write_atomic(tmp_path):
+    umask = os.umask(0o022)
+    try:
+        out = tmp_path / "out.yml"
+        conda_envfile._write_atomic(out, "a")
+        assert out.stat().st_mode & 0o777 == 0o644
+
+        out.chmod(0o640)
+        conda_envfile._write_atomic(out, "b")
+        assert out.stat().st_mode & 0o777 == 0o640
+        assert out.read_text() == "b"
+
+        link = tmp_path / "link.yml"
+        link.symlink_to(out)
+        conda_envfile._write_atomic(link, "c")
+        assert link.is_symlink()
+        assert out.read_text() == "c"
+        assert sorted(os.listdir(tmp_path)) == ["link.yml", "out.yml"]
+    finally:
+        os.umask(umask)
+
+
+def test_IncrementalMerger_clash(tmp_path):
+    a = tmp_path / "a.yml"
+    b = tmp_path / "b.yml"
+    a.write_text("dependencies:\n- foo >=1.0\n- bar\n")
+    b.write_text("dependencies:\n- foo <2.0\n")
+
+    merger = conda_envfile.IncrementalMerger([a, b])
+    before = list(map(str, merger.dependencies()))
+    assert before == ["bar", "foo >=1.0, <2.0"]
+
+    a.write_text("dependencies:\n- foo >=3.0\n- baz\n")
+    os.utime(a, ns=(0, 1))
+    with pytest.warns(UserWarning):
+        assert merger.poll() == set()
+    assert list(map(str, merger.dependencies())) == before
+
+    b.write_text("dependencies:\n- foo <2.0\n- qux\n")
+    os.utime(b, ns=(0, 2))
+    assert merger.poll() == {"foo", "qux"}
+    assert list(map(str, merger.dependencies())) == ["bar", "foo >=1.0, <2.0", "qux"]
+
+    a.write_text("dependencies:\n- foo >=1.5\n- baz\n")
+    os.utime(a, ns=(0, 3))
+    assert merger.poll() == {"foo", "bar", "baz"}
+    assert list(map(str, merger.dependencies())) == ["baz", "foo >=1.5, <2.0", "qux"]
+
+    # a failing callback does not stop watching
+    calls = []
+
+    def callback(merger):
+        calls.append(merger)
+        a.write_text("dependencies:\n- foo >=1.6\n")
+        os.utime(a, ns=(0, 4 + len(calls)))
+        raise RuntimeError("failing callback")
+
+    b.write_text("dependencies:\n- foo <2.0\n")
+    os.utime(b, ns=(0, 4))
+    with pytest.warns(UserWarning, match="failing callback"):
+        merger.watch(callback, interval=0, count=2)
+    assert len(calls) == 2
+
+
+def test_merge_github_action(tmp_path):
+    (tmp_path / "env.yml").write_text("name: foo\ndependencies:\n  - bar >=1.0\n")
+    (tmp_path / "other.yml").write_text("dependencies:\n  - bar <2.0\n")
+    action = tmp_path / "action.yml"
+    action.write_text(
+        "steps:\n"
+        "  - uses: mamba-org/provision-with-micromamba@main\n"
+        "    with:\n"
+        f"      environment-file: {tmp_path / 'env.yml'}\n"
+        "      extra-specs: |\n"
+        "        baz\n"
+    )
+
+    out = tmp_path / "merged.yml"
+    args = ["--github-action", str(action), "--github-action", str(action)]
+    conda_envfile.conda_envfile_merge([*args, "-f", "-o", str(out), str(tmp_path / "other.yml")])
+    env = conda_envfile.parse_file(out)
+    assert env["name"] == "foo"
+    assert list(map(str, env["dependencies"])) == ["bar >=1.0, <2.0", "baz"]
+
+
+def test_MergeIndex():
+    index = conda_envfile.MergeIndex()
+    assert index.add("a", ["foo >=1.0", "bar"]) == {"foo", "bar"}
+    assert index.add("b", ["foo <2.0", "baz =1.*"]) == {"foo", "baz"}
+    assert list(map(str, index.dependencies())) == ["bar", "baz =1.*", "foo >=1.0, <2.0"]
+
+    with pytest.raises(ValueError):
+        index.add("c", ["foo >2.0"])
+    assert index.sources == ["a", "b"]
+    assert str(index["foo"]) == "foo >=1.0, <2.0"
+
+    index.add("c", ["foo <=1.0"])
+    assert str(index["foo"]) == "foo =1.0"
+    index.add("c", ["foo <1.5"])
+    assert str(index["foo"]) == "foo >=1.0, <1.5"
+    assert index.remove("b") == {"foo", "baz"}
+    assert "baz" not in index
+    assert list(map(str, index.dependencies())) == ["bar", "foo >=1.0, <1.5"]
+
+    versions = ["1", "1.0", "1.2", "1.2.0", "2", "2.0.1", "1.10"]
+    rng = random.Random(0)
+
+    def spec():
+        v, w = rng.choice(versions), rng.choice(versions)
+        name = rng.choice(["foo", "bar"])
+        ops = ["", " *", f" ={v}", f" =={v}", f" >{v}", f" >={v}", f" <{v}", f" <={v}"]
+        ops += [f" >={v}, <{w}", f" ={v}=abc"]
+        return name + rng.choice(ops)
+
+    # same ranges as unique (unique may fail on an intermediate wildcard, which is skipped)
+    for _ in range(2000):
+        index = conda_envfile.MergeIndex()
+        sources = {}
+        for _ in range(6):
+            if sources and rng.random() < 0.3:
+                source = rng.choice(list(sources))
+                index.remove(source)
+                del sources[source]
+                continue
+            source = rng.randint(0, 4)
+            deps = [spec() for _ in range(rng.randint(1, 3))]
+            try:
+                index.add(source, deps)
+                sources[source] = deps
+            except ValueError:
+                with pytest.raises((ValueError, AssertionError)):
+                    conda_envfile.unique(*sum({**sources, source: deps}.values(), []))
+                continue
+            try:
+                expect = conda_envfile.unique(*sum(sources.values(), []))
+            except AssertionError:
+                continue
+            result = index.dependencies()
+            assert [i.name for i in result] == [i.name for i in expect]
+            assert all(a.range.same(b.range) for a, b in zip(result, expect))
+
+
+def test_VersionIndex(tmp_path):
+    specs = [
+        "numpy >=1.20, <2",
+        "numpy",
+        "numpy =1.26",
+        "numpy >2.0",
+        "numpy <=1.20",
+        "numpy >=1.20, <2",
+    ]
+    files = []
+    for i, spec in enumerate(specs):
+        files.append(str(tmp_path / f"env{i}.yaml"))
+        pathlib.Path(files[-1]).write_text(f"dependencies:\n- {spec}\n- python\n")
+
+    index = conda_envfile.VersionIndex.from_files(*files)
+    assert "numpy" in index
+    assert index.sources("numpy") == files
+    assert index.accepts("numpy", "1.26.4") == [files[0], files[1], files[2], files[5]]
+    assert index.accepts("numpy", "1.20") == [files[0], files[1], files[4], files[5]]
+    assert index.accepts("numpy", "2.0") == [files[1]]
+    assert index.accepts("scipy", "1.0") == []
+    assert index.conflicts("numpy", ">=2.0") == [files[0], files[2], files[4], files[5]]
+    assert index.conflicts("numpy", "<1.20") == [files[0], files[2], files[3], files[5]]
+    assert index.conflicts("numpy", "==1.20") == [files[2], files[3]]
+
+    versions = ["0.9", "1", "1.0", "1.2", "1.2.0", "1.10", "2", "2.0.1", "3"]
+    rng = random.Random(0)
+    index = conda_envfile.VersionIndex()
+    ranges = []
+    for source in range(200):
+        v, w = rng.choice(versions), rng.choice(versions)
+        ops = ["", " *", f" ={v}", f" =={v}", f" >{v}", f" >={v}", f" <{v}", f" <={v}"]
+        ops += [f" >={v}, <{w}", f" >{v}, <={w}"]
+        try:
+            dep = conda_envfile.PackageSpecifier("foo" + rng.choice(ops))
+        except ValueError:
+            continue
+        index.add(source, [dep])
+        ranges.append((source, dep.range))
+
+    for version in versions + ["1.1", "1.2.5", "5"]:
+        key = conda_envfile._version_key(version)
+        expect = []
+        for source, r in ranges:
+            if r.eq and key == r._eq or not r.eq and conda_envfile.VersionRange(equal=version) in r:
+                expect.append(source)
+        assert index.accepts("foo", version) == expect
+
+    for other in [">=1.2", ">1.2", "<1.2", "<=1.2", ">=1.0, <2", "==1.2", ">2.0.1", ""]:
+        other_range = conda_envfile.PackageSpecifier(f"foo {other}").range
+        expect = []
+        for source, r in ranges:
+            try:
+                r + other_range
+            except ValueError:
+                expect.append(source)
+        assert index.conflicts("foo", other) == expect